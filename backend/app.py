@@ -7,102 +7,168 @@ from ebooklib import epub
 import tensorflow as tf
 from PIL import Image
 import io
-from kindle_mobi import Mobi
+import sqlite3
 import img2pdf
+from werkzeug.utils import secure_filename
+from functions import metrics
+from functions.docx_pdf import office_pool, render_docx_to_pdf
+from functions.doc_index import INGEST_ROOT, DocumentIndex, extract_record
+from functions.pdf_crypt import ALGORITHMS, CRYPT_MODES, ERRORS_MANIFEST, batch_crypt_pdfs
+from functions.uploads import MAX_UPLOAD_BYTES, SpoolingRequest, spool_upload
+from functions.image_extract import extract_unique_images
+from functions.mobi_writer import write_mobi
+from functions.toc import detect_headings, write_outline
+from functions.pdf_html import HTML_CACHE_DIR, render_page
+from functions.pdf_html import convert_pdf_to_html as render_pdf_html
+from functions.pptx_pdf import render_pptx_to_pdf
+from functions import chunked_upload
 
 
 app = Flask(__name__)
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+metrics.init_app(app)
+document_index = DocumentIndex()
+
+# Origin allowed to call the chunked upload API from the browser, configurable with EBC_CORS_ORIGIN
+CORS_ORIGIN = os.environ.get('EBC_CORS_ORIGIN', 'http://localhost:3000')
+
+@app.after_request
+def add_upload_cors_headers(response):
+    """Allow the frontend to call the chunk routes cross-origin, including their preflight."""
+    if request.path.startswith('/upload'):
+        response.headers['Access-Control-Allow-Origin'] = CORS_ORIGIN
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, X-Chunk-SHA256'
+        response.headers['Access-Control-Max-Age'] = '600'
+        response.headers['Vary'] = 'Origin'
+    return response
 
 # Reads in a PDF file and returns the text content
 def process_pdf(file):
     """Process a PDF file and extract text."""
-    reader = PdfFileReader(file)
+    with metrics.stage('parse'):
+        reader = PdfFileReader(file)
     text_content = ""
-    for page_num in range(reader.getNumPages()):
-        page = reader.getPage(page_num)
-        text_content += page.extractText()
+    with metrics.stage('extract'):
+        for page_num in range(reader.getNumPages()):
+            page = reader.getPage(page_num)
+            text_content += page.extractText()
+    metrics.record_pages(reader.getNumPages(), 'extract')
     return text_content
 
 
 # Reads in a DOCX file and returns the text content
 def process_docx(file):
     """Process a DOCX file and extract text."""
-    doc = Document(file)
-    text_content = "\n".join([para.text for para in doc.paragraphs])
+    with metrics.stage('parse'):
+        doc = Document(file)
+    with metrics.stage('extract'):
+        text_content = "\n".join([para.text for para in doc.paragraphs])
     return text_content
 
 # Resize an image to the specified dimensions
 def resize_image(image_path, width, height):
     """Resize an image to the specified dimensions."""
-    img = cv2.imread(image_path)
-    resized_img = cv2.resize(img, (width, height))
+    with metrics.stage('image_decode'):
+        img = cv2.imread(image_path)
+    metrics.record_bytes('in', os.path.getsize(image_path), stage='image_decode')
+    with metrics.stage('image_resize'):
+        resized_img = cv2.resize(img, (width, height))
     resized_path = 'resized_' + os.path.basename(image_path)
-    cv2.imwrite(resized_path, resized_img)
+    with metrics.stage('image_encode'):
+        cv2.imwrite(resized_path, resized_img)
+    metrics.record_output_file(resized_path, 'image_encode')
     return resized_path
 
-# Create an EPUB file from text content
-def create_epub(text_content, title="Sample Ebook", author="Author Name"):
-    """Create an EPUB file from text content."""
+# Build an in-memory EPUB book from text content
+def build_epub_book(text_content, title="Sample Ebook", author="Author Name"):
+    """Build an EPUB book object from text content."""
     book = epub.EpubBook()
     book.set_title(title)
     book.add_author(author)
     chapter = epub.EpubHtml(title='Chapter 1', file_name='chap_01.xhtml', content=text_content)
     book.add_item(chapter)
+    book.spine = [chapter]
+    return book
+
+# Create an EPUB file from text content (or an already built book)
+def create_epub(text_content, title="Sample Ebook", author="Author Name", book=None):
+    """Create an EPUB file from text content."""
+    book = book or build_epub_book(text_content, title, author)
     epub_path = 'sample.epub'
-    epub.write_epub(epub_path, book, {})
+    with metrics.stage('epub'):
+        epub.write_epub(epub_path, book, {})
+    metrics.record_output_file(epub_path, 'epub')
     return epub_path
 
-# Convert an EPUB file to MOBI format
-def convert_to_mobi(epub_path):
-    """Convert an EPUB file to MOBI format."""
-    mobi_path = epub_path.replace('.epub', '.mobi')
-    Mobi(epub_path).write(mobi_path)
+# Convert an EPUB book (in memory, or a path on disk) to MOBI format
+def convert_to_mobi(book, mobi_path='sample.mobi'):
+    """Convert an EPUB book to MOBI format."""
+    with metrics.stage('mobi'):
+        if isinstance(book, str):
+            mobi_path = book.replace('.epub', '.mobi')
+            book = epub.read_epub(book)
+        write_mobi(book, mobi_path)
+    metrics.record_output_file(mobi_path, 'mobi')
     return mobi_path
 
 
 # Compress a PDF file
 def compress_pdf(file):
     """Compress a PDF file."""
-    reader = PdfFileReader(file)
-    writer = PdfFileWriter()
-    for page_num in range(reader.getNumPages()):
-        page = reader.getPage(page_num)
-        writer.addPage(page)
-    compressed_path = 'compressed.pdf'
-    with open(compressed_path, 'wb') as output_file:
-        writer.write(output_file)
+    with metrics.stage('compress'):
+        reader = PdfFileReader(file)
+        writer = PdfFileWriter()
+        for page_num in range(reader.getNumPages()):
+            page = reader.getPage(page_num)
+            writer.addPage(page)
+        compressed_path = 'compressed.pdf'
+        with open(compressed_path, 'wb') as output_file:
+            writer.write(output_file)
+    metrics.record_pages(reader.getNumPages(), 'compress')
+    metrics.record_output_file(compressed_path, 'compress')
     return compressed_path
 
 
 # Apply AI-based image enhancement
 def enhance_image(image_path):
     """Apply AI-based image enhancement."""
-    img = Image.open(image_path)
+    with metrics.stage('image_decode'):
+        img = Image.open(image_path)
+        img.load()
     # Apply AI-based enhancement techniques (e.g., super-resolution, denoising)
     # Here, we're just applying a simple sharpening filter as an example
-    enhanced_img = img.filter(Image.SHARPEN)
+    with metrics.stage('image_enhance'):
+        enhanced_img = img.filter(Image.SHARPEN)
     enhanced_path = 'enhanced_' + os.path.basename(image_path)
-    enhanced_img.save(enhanced_path)
+    with metrics.stage('image_encode'):
+        enhanced_img.save(enhanced_path)
+    metrics.record_output_file(enhanced_path, 'image_encode')
     return enhanced_path
 
 # Convert multiple images to a PDF file
 def convert_images_to_pdf(image_paths):
     """Convert multiple images to a PDF file."""
     pdf_path = 'converted.pdf'
-    with open(pdf_path, 'wb') as f:
-        f.write(img2pdf.convert(image_paths))
+    with metrics.stage('images_to_pdf'):
+        with open(pdf_path, 'wb') as f:
+            f.write(img2pdf.convert(image_paths))
+    metrics.record_pages(len(image_paths), 'images_to_pdf')
+    metrics.record_output_file(pdf_path, 'images_to_pdf')
     return pdf_path
 
 # Convert a PDF file to multiple images
 def convert_pdf_to_images(pdf_path):
     """Convert a PDF file to multiple images."""
     images = []
-    with open(pdf_path, 'rb') as f:
+    with metrics.stage('pdf_to_images'), open(pdf_path, 'rb') as f:
         pdf = PdfFileReader(f)
         for page_num in range(pdf.getNumPages()):
             page = pdf.getPage(page_num)
             # Extract images from the page and save them
             # Append the image paths to the `images` list
+        metrics.record_pages(pdf.getNumPages(), 'pdf_to_images')
     return images
 
 # Extract metadata from a PDF or DOCX file
@@ -154,9 +220,15 @@ def split_pdf(pdf_file, output_dir='split_pages'):
 
 def convert_docx_to_pdf(docx_path, pdf_path='converted.pdf'):
     """Convert a DOCX file to a PDF."""
-    # Using a library like docx2pdf or win32com (on Windows)
-    import subprocess
-    subprocess.run(['docx2pdf', docx_path, pdf_path])
+    # Render in-process; only fall back to the persistent office pool if one is configured
+    with metrics.stage('docx_to_pdf'):
+        try:
+            render_docx_to_pdf(docx_path, pdf_path)
+        except Exception:
+            if office_pool is None:
+                raise
+            office_pool.convert(docx_path, pdf_path)
+    metrics.record_output_file(pdf_path, 'docx_to_pdf')
     return pdf_path
 
 def text_to_speech(text_content, output_path='output.mp3'):
@@ -182,12 +254,9 @@ def translate_text(text_content, target_language='es'):
 
 def convert_pdf_to_html(pdf_path, output_dir='html_pages'):
     """Convert PDF pages to HTML format."""
-    import pdf2htmlEX
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    output_path = os.path.join(output_dir, os.path.basename(pdf_path).replace('.pdf', '.html'))
-    subprocess.run(['pdf2htmlEX', pdf_path, output_path])
-    return output_path
+    with metrics.stage('pdf_to_html'):
+        sha256, index_path = render_pdf_html(pdf_path, cache_dir=output_dir)
+    return index_path
 
 
 def encrypt_pdf(pdf_file, password, output_path='encrypted.pdf'):
@@ -217,83 +286,121 @@ def decrypt_pdf(encrypted_pdf_file, password, output_path='decrypted.pdf'):
         raise ValueError("Incorrect password")
 
 
-def extract_images_from_pdf(pdf_file, output_dir='extracted_images'):
-    """Extract and save all images from a PDF file."""
-    from PyPDF2 import PdfFileReader
-    import fitz  # PyMuPDF
-
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    pdf_document = fitz.open(pdf_file)
-    image_paths = []
-
-    for page_num in range(len(pdf_document)):
-        page = pdf_document.load_page(page_num)
-        images = page.get_images(full=True)
-
-        for img_index, img in enumerate(images):
-            xref = img[0]
-            base_image = pdf_document.extract_image(xref)
-            image_bytes = base_image["image"]
-            image_ext = base_image["ext"]
-            image_path = os.path.join(output_dir, f"page_{page_num + 1}_img_{img_index + 1}.{image_ext}")
-            with open(image_path, "wb") as image_file:
-                image_file.write(image_bytes)
-            image_paths.append(image_path)
-    
+def extract_images_from_pdf(pdf_file, output_dir='extracted_images', min_bytes=0, min_pixels=0):
+    """Extract and save all unique images from a PDF file."""
+    with metrics.stage('extract_images'):
+        if isinstance(pdf_file, str):
+            image_paths, manifest_path = extract_unique_images(pdf_file, output_dir, min_bytes=min_bytes, min_pixels=min_pixels)
+        else:
+            # Worker processes reopen the document, so they need it on disk
+            with spool_upload(pdf_file, filename=getattr(pdf_file, 'filename', None) or 'document.pdf') as upload:
+                image_paths, manifest_path = extract_unique_images(upload.path, output_dir, min_bytes=min_bytes, min_pixels=min_pixels)
+    for image_path in image_paths:
+        metrics.record_output_file(image_path, 'extract_images')
     return image_paths
 
 
-def add_toc_to_pdf(pdf_path, toc, output_path='pdf_with_toc.pdf'):
-    """Add a table of contents to a PDF."""
-    from PyPDF2 import PdfFileReader, PdfFileWriter
-    reader = PdfFileReader(pdf_path)
-    writer = PdfFileWriter()
-
-    for page_num in range(reader.getNumPages()):
-        writer.addPage(reader.getPage(page_num))
-
-    for entry in toc:
-        writer.addBookmark(entry['title'], entry['page'])
-
-    with open(output_path, 'wb') as output_file:
-        writer.write(output_file)
+def add_toc_to_pdf(pdf_path, toc=None, output_path='pdf_with_toc.pdf'):
+    """Add a table of contents to a PDF, detecting headings when no toc is given."""
+    with metrics.stage('toc'):
+        if toc is None:
+            toc = detect_headings(pdf_path)
+        write_outline(pdf_path, toc, output_path)
     return output_path
 
 def convert_pptx_to_pdf(pptx_path, output_path='presentation.pdf'):
     """Convert a PowerPoint presentation to a PDF."""
-    from pptx import Presentation
-
-    prs = Presentation(pptx_path)
-    # Export slides to images and then convert to PDF
-    # Placeholder code: implement actual logic to convert slides to PDF
+    with metrics.stage('pptx_to_pdf'):
+        render_pptx_to_pdf(pptx_path, output_path)
+    metrics.record_output_file(output_path, 'pptx_to_pdf')
     return output_path
 
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Upload and process PDF/DOCX files."""
-    file = request.files['file']
-    file_type = file.filename.split('.')[-1].lower()
-    width = int(request.form.get('width', 800))
-    height = int(request.form.get('height', 600))
-    text_content = ""
+    # Spool once; each stage gets its own reader over the same memory map
+    with spool_upload(request.files['file']) as upload:
+        return jsonify(process_document(upload))
 
+# Run the ebook pipeline on a spooled or chunk-assembled upload
+def process_document(upload):
+    """Extract, index and export an uploaded PDF/DOCX."""
+    text_content = ""
+    compressed_path = None
+    file_type = upload.extension
     if file_type == 'pdf':
-        text_content = process_pdf(file)
-        compressed_path = compress_pdf(file)
+        text_content = process_pdf(upload.open())
+        compressed_path = compress_pdf(upload.open())
     elif file_type == 'docx':
-        text_content = process_docx(file)
-
-    epub_path = create_epub(text_content)
-    mobi_path = convert_to_mobi(epub_path)
-    return jsonify({
+        text_content = process_docx(upload.open())
+
+    if file_type in ('pdf', 'docx'):
+        with metrics.stage('index'):
+            # Reuse the extracted text; only metadata is read again
+            record = extract_record(upload.open(), upload.filename, text=text_content)
+            # Key uploads by content, not by the client-supplied filename
+            record['path'] = f"upload:{record['sha256']}"
+            record['title'] = record.get('title') or upload.filename
+            document_index.add(record)
+
+    # Both exports share one in-memory book; MOBI no longer re-reads the EPUB from disk
+    book = build_epub_book(text_content)
+    epub_path = create_epub(text_content, book=book)
+    mobi_path = convert_to_mobi(book)
+    return {
         'message': 'File processed',
         'epub_path': epub_path,
         'mobi_path': mobi_path,
         'compressed_path': compressed_path
-    })
+    }
+
+@app.route('/upload/init', methods=['POST'])
+def upload_init():
+    """Start a resumable chunked upload."""
+    chunked_upload.sweep_expired()
+    try:
+        meta = chunked_upload.init_upload(
+            request.form['filename'],
+            int(request.form['size']),
+            chunk_size=int(request.form.get('chunk_size', chunked_upload.DEFAULT_CHUNK_SIZE)),
+            sha256=request.form.get('sha256'),
+        )
+    except chunked_upload.ChunkError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(meta)
+
+@app.route('/upload/<upload_id>/chunk/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """Store one chunk of a resumable upload; chunks may arrive in any order."""
+    data = request.get_data(cache=False)
+    try:
+        received = chunked_upload.write_chunk(upload_id, index, data, request.headers.get('X-Chunk-SHA256'))
+    except chunked_upload.ChunkError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify({'upload_id': upload_id, 'received': received})
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Report which chunks of a resumable upload have been received."""
+    try:
+        return jsonify(chunked_upload.upload_status(upload_id))
+    except chunked_upload.ChunkError as e:
+        return jsonify({'message': str(e)}), 404
+
+@app.route('/upload/<upload_id>/complete', methods=['POST'])
+def upload_complete(upload_id):
+    """Assemble a chunked upload in its job workspace and process it."""
+    try:
+        upload = chunked_upload.complete_upload(upload_id)
+    except chunked_upload.ChunkError as e:
+        return jsonify({'message': str(e)}), 400
+    try:
+        with upload:
+            return jsonify({'upload_id': upload_id, **process_document(upload)})
+    finally:
+        # Outputs are written elsewhere; the workspace is only needed until processing is done
+        chunked_upload.discard_upload(upload_id)
 
 @app.route('/resize_image', methods=['POST'])
 def resize_image_route():
@@ -306,9 +413,8 @@ def resize_image_route():
     else:
         width = int(request.form.get('hardcover_width', 1000))
         height = int(request.form.get('hardcover_height', 800))
-    file_path = 'uploaded_' + file.filename
-    file.save(file_path)
-    resized_path = resize_image(file_path, width, height)
+    with spool_upload(file) as upload:
+        resized_path = resize_image(upload.path, width, height)
     enhanced_path = enhance_image(resized_path)
     return jsonify({
         'message': 'Image resized and enhanced',
@@ -319,24 +425,116 @@ def resize_image_route():
 @app.route('/convert_images_to_pdf', methods=['POST'])
 def convert_images_to_pdf_route():
     """Convert multiple images to a PDF file."""
-    files = request.files.getlist('files')
-    image_paths = []
-    for file in files:
-        file_path = 'uploaded_' + file.filename
-        file.save(file_path)
-        image_paths.append(file_path)
-    pdf_path = convert_images_to_pdf(image_paths)
+    uploads = [spool_upload(file) for file in request.files.getlist('files')]
+    try:
+        pdf_path = convert_images_to_pdf([upload.path for upload in uploads])
+    finally:
+        for upload in uploads:
+            upload.close()
     return jsonify({'message': 'Images converted to PDF', 'pdf_path': pdf_path})
 
 @app.route('/convert_pdf_to_images', methods=['POST'])
 def convert_pdf_to_images_route():
     """Convert a PDF file to multiple images."""
-    file = request.files['file']
-    file_path = 'uploaded_' + file.filename
-    file.save(file_path)
-    image_paths = convert_pdf_to_images(file_path)
+    with spool_upload(request.files['file']) as upload:
+        image_paths = convert_pdf_to_images(upload.path)
     return jsonify({'message': 'PDF converted to images', 'image_paths': image_paths})
 
+@app.route('/convert_pdf_to_html', methods=['POST'])
+def convert_pdf_to_html_route():
+    """Convert a PDF to lazily loaded HTML pages."""
+    with spool_upload(request.files['file']) as upload:
+        with metrics.stage('pdf_to_html'):
+            sha256, index_path = render_pdf_html(upload.path)
+    return jsonify({
+        'message': 'PDF converted to HTML',
+        'document_id': sha256,
+        'index_url': f'/html_pages/{sha256}/index.html'
+    })
+
+@app.route('/html_pages/<sha256>/index.html', methods=['GET'])
+def html_index(sha256):
+    """Serve the lazy-loading HTML index of a converted PDF."""
+    path = os.path.join(HTML_CACHE_DIR, secure_filename(sha256), 'index.html')
+    if not os.path.isfile(path):
+        return jsonify({'message': 'Page not found'}), 404
+    return send_file(os.path.abspath(path))
+
+@app.route('/html_pages/<sha256>/page_<int:page_number>.html', methods=['GET'])
+def html_page(sha256, page_number):
+    """Serve one HTML page fragment, rendering it if it is not cached yet."""
+    try:
+        path = render_page(secure_filename(sha256), page_number)
+    except (FileNotFoundError, IndexError, ValueError):
+        return jsonify({'message': 'Page not found'}), 404
+    return send_file(os.path.abspath(path))
+
+@app.route('/index_directory', methods=['POST'])
+def index_directory_route():
+    """Bulk index every PDF/DOCX in a directory under the configured ingest root."""
+    if not INGEST_ROOT:
+        return jsonify({'message': 'Directory indexing is disabled; set EBC_INGEST_ROOT'}), 403
+    root = os.path.realpath(INGEST_ROOT)
+    directory = os.path.realpath(os.path.join(root, request.form.get('directory', '')))
+    if os.path.commonpath([root, directory]) != root:
+        return jsonify({'message': 'Directory is outside the ingest root'}), 403
+    if not os.path.isdir(directory):
+        return jsonify({'message': 'Directory not found', 'directory': request.form.get('directory')}), 400
+    workers = request.form.get('workers')
+    if workers and not workers.isdigit():
+        return jsonify({'message': 'workers must be a positive integer'}), 400
+    summary = document_index.ingest_directory(directory, workers=int(workers) if workers and int(workers) > 0 else None)
+    return jsonify({'message': 'Directory indexed', **summary})
+
+@app.route('/search', methods=['GET'])
+def search_route():
+    """Search indexed documents by text, trim size and author."""
+    try:
+        results = document_index.search(
+            query=request.args.get('q'),
+            trim=request.args.get('trim'),
+            author=request.args.get('author'),
+            limit=int(request.args.get('limit', 50)),
+        )
+    except (ValueError, sqlite3.OperationalError) as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify({'results': results})
+
+@app.route('/batch_crypt', methods=['POST'])
+def batch_crypt_route():
+    """Encrypt or decrypt multiple PDFs and return them as a zip, listing failures in errors.json."""
+    files = request.files.getlist('files')
+    mode = request.form.get('mode', 'encrypt')
+    # Checked before mode names a metrics stage or an output file
+    if mode not in CRYPT_MODES:
+        return jsonify({'message': f'Unsupported mode: {mode}'}), 400
+    algorithm = request.form.get('algorithm', 'aes-256')
+    if mode == 'encrypt' and algorithm not in ALGORITHMS:
+        return jsonify({'message': f'Unsupported algorithm: {algorithm}'}), 400
+    password = request.form['password']
+    # Workers open the spooled paths themselves instead of receiving pickled bytes
+    uploads = [spool_upload(file) for file in files]
+    try:
+        with metrics.stage(f'batch_{mode}'):
+            output_zip, errors = batch_crypt_pdfs(
+                [(upload.filename, upload.path) for upload in uploads],
+                mode,
+                password,
+                owner_password=request.form.get('owner_password'),
+                algorithm=algorithm,
+                output_zip=f'{mode}ed_pdfs.zip',
+            )
+    finally:
+        for upload in uploads:
+            upload.close()
+    metrics.record_output_file(output_zip, f'batch_{mode}')
+    response = send_file(os.path.abspath(output_zip), as_attachment=True)
+    if errors:
+        # The failed files are listed in the zip's errors manifest
+        response.headers['X-Batch-Errors'] = str(len(errors))
+        response.headers['X-Batch-Errors-Manifest'] = ERRORS_MANIFEST
+    return response
+
 @app.route('/download_epub/<path:filename>', methods=['GET'])
 def download_epub(filename):
     """Download an EPUB file."""
@@ -0,0 +1,160 @@
+"""Build print-ready books for a whole catalog from a manifest.
+
+Usage (from backend/):
+    python -m functions.batch_build catalog.csv --output-dir builds --workers 8
+
+Manifest rows (CSV header or JSON list of objects):
+    id, manuscript, cover, back_cover, trim_sizes, spine_width
+trim_sizes is a ';'-separated list of TRIM_SIZES names (e.g. "6 x 9 in;5 x 8 in") or "all".
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from functions import metrics
+from functions.print2 import TRIM_SIZES, BuildStageError, create_print_ready_book
+
+STATE_FILE = '.build_state.json'
+REPORT_FILE = 'build_report.json'
+
+
+def load_manifest(manifest_path):
+    """Read book entries from a CSV or JSON manifest, resolving paths relative to it."""
+    with open(manifest_path, newline='') as manifest_file:
+        if manifest_path.lower().endswith('.json'):
+            rows = json.load(manifest_file)
+        else:
+            rows = list(csv.DictReader(manifest_file))
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    books = []
+    seen_ids = set()
+    for number, row in enumerate(rows, start=1):
+        trim_names = row.get('trim_sizes') or 'all'
+        if isinstance(trim_names, str):
+            trim_names = list(TRIM_SIZES) if trim_names.strip() == 'all' else [
+                name.strip() for name in trim_names.split(';') if name.strip()
+            ]
+        unknown = [name for name in trim_names if name not in TRIM_SIZES]
+        if unknown:
+            raise ValueError(f"Row {number}: unknown trim sizes {unknown}")
+        manuscript = os.path.join(base_dir, row['manuscript'])
+        book_id = row.get('id') or os.path.splitext(os.path.basename(manuscript))[0]
+        # Books with the same id would build into the same folder
+        if book_id in seen_ids:
+            raise ValueError(f"Row {number}: duplicate id {book_id!r}")
+        seen_ids.add(book_id)
+        books.append({
+            'id': book_id,
+            'manuscript': manuscript,
+            'cover': os.path.join(base_dir, row['cover']),
+            'back_cover': os.path.join(base_dir, row['back_cover']),
+            'trim_sizes': trim_names,
+            # Spine width is in cover image pixels
+            'spine_width': int(round(float(row.get('spine_width') or 36))),
+        })
+    return books
+
+
+def input_fingerprint(book):
+    """Hash the input files and build options of one book."""
+    digest = hashlib.sha256()
+    for key in ('manuscript', 'cover', 'back_cover'):
+        with open(book[key], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    digest.update(json.dumps([book['trim_sizes'], book['spine_width']]).encode())
+    return digest.hexdigest()
+
+
+def build_book(book, output_dir):
+    """Build one book in its own working directory and return its report entry."""
+    book_dir = os.path.abspath(os.path.join(output_dir, book['id']))
+    os.makedirs(book_dir, exist_ok=True)
+    output_zip = os.path.join(book_dir, f"{book['id']}.zip")
+    entry = {'id': book['id'], 'output': output_zip}
+    start = time.perf_counter()
+    try:
+        fingerprint = input_fingerprint(book)
+        state_path = os.path.join(book_dir, STATE_FILE)
+        if os.path.exists(output_zip) and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                if json.load(state_file).get('fingerprint') == fingerprint:
+                    return {**entry, 'status': 'skipped', 'seconds': time.perf_counter() - start, 'stages': {}}
+
+        # The print stages write intermediates into the CWD, so each worker process works in the book's folder
+        os.chdir(book_dir)
+        with metrics.collect_timings() as stages:
+            create_print_ready_book(
+                book['manuscript'],
+                book['cover'],
+                book['back_cover'],
+                {name: TRIM_SIZES[name] for name in book['trim_sizes']},
+                spine_width=book['spine_width'],
+                output_zip=output_zip,
+                raise_errors=True,
+            )
+        with open(state_path, 'w') as state_file:
+            json.dump({'fingerprint': fingerprint, 'built_at': time.time()}, state_file)
+        return {**entry, 'status': 'built', 'seconds': time.perf_counter() - start, 'stages': dict(stages)}
+    except BuildStageError as e:
+        return {**entry, 'status': 'failed', 'error': str(e), 'failed_stage': e.stage, 'trim_size': e.size_name,
+                'seconds': time.perf_counter() - start, 'stages': dict(stages)}
+    except Exception as e:
+        return {**entry, 'status': 'failed', 'error': str(e), 'seconds': time.perf_counter() - start, 'stages': {}}
+
+
+# Schedule every book of a manifest across a process pool
+def build_catalog(manifest_path, output_dir='builds', workers=None):
+    """Build all books in a manifest, skipping unchanged ones, and write a summary report."""
+    books = load_manifest(manifest_path)
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_book, book, output_dir): book for book in books}
+        for done, future in enumerate(as_completed(futures), start=1):
+            entry = future.result()
+            results.append(entry)
+            print(f"[{done}/{len(books)}] {entry['id']}: {entry['status']} in {entry['seconds']:.1f}s"
+                  + (f" ({entry['error']})" if entry.get('error') else ''), flush=True)
+
+    stage_totals = {}
+    for entry in results:
+        for stage, seconds in entry['stages'].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    report = {
+        'manifest': os.path.abspath(manifest_path),
+        'seconds': time.perf_counter() - start,
+        'counts': {status: sum(1 for e in results if e['status'] == status) for status in ('built', 'skipped', 'failed')},
+        'stage_seconds': stage_totals,
+        'books': sorted(results, key=lambda e: e['id']),
+    }
+    report_path = os.path.join(output_dir, REPORT_FILE)
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    return report_path, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build print-ready books from a catalog manifest.')
+    parser.add_argument('manifest', help='CSV or JSON manifest of books')
+    parser.add_argument('--output-dir', default='builds', help='Directory for per-book outputs and the report')
+    parser.add_argument('--workers', type=int, default=None, help='Number of parallel build processes')
+    args = parser.parse_args(argv)
+
+    report_path, report = build_catalog(args.manifest, args.output_dir, args.workers)
+    counts = report['counts']
+    print(f"Built {counts['built']}, skipped {counts['skipped']}, failed {counts['failed']} "
+          f"in {report['seconds']:.1f}s. Report: {report_path}")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
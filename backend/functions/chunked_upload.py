@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+from functions.uploads import MAX_UPLOAD_BYTES, SpooledUpload
+
+# Each chunked upload gets its own job workspace under this directory
+WORKSPACE_DIR = os.environ.get('EBC_WORKSPACE_DIR', 'jobs')
+
+# Workspaces untouched for this long are removed, configurable with EBC_UPLOAD_TTL_HOURS
+UPLOAD_TTL_SECONDS = float(os.environ.get('EBC_UPLOAD_TTL_HOURS', '24')) * 3600
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class ChunkError(ValueError):
+    """Raised when a chunk or upload does not match what was announced at init."""
+
+
+def _job_dir(upload_id):
+    # Upload ids are generated hex strings; anything else cannot name a workspace
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise ChunkError("Invalid upload id")
+    return os.path.join(WORKSPACE_DIR, upload_id)
+
+
+def _load_meta(upload_id):
+    job_dir = _job_dir(upload_id)
+    try:
+        with open(os.path.join(job_dir, 'meta.json')) as meta_file:
+            return job_dir, json.load(meta_file)
+    except FileNotFoundError:
+        raise ChunkError("Unknown upload id")
+
+
+def _chunk_count(meta):
+    return max(1, -(-meta['size'] // meta['chunk_size']))
+
+
+# Start an upload: reserve a workspace and preallocate the assembly file
+def init_upload(filename, size, chunk_size=DEFAULT_CHUNK_SIZE, sha256=None):
+    """Create a resumable upload and return its metadata."""
+    if size < 0 or size > MAX_UPLOAD_BYTES:
+        raise ChunkError(f"Upload size must be between 0 and {MAX_UPLOAD_BYTES} bytes")
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ChunkError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+    upload_id = uuid.uuid4().hex
+    job_dir = _job_dir(upload_id)
+    os.makedirs(os.path.join(job_dir, 'chunks'))
+    meta = {
+        'upload_id': upload_id,
+        'filename': secure_filename(filename) or 'upload',
+        'size': size,
+        'chunk_size': chunk_size,
+        'sha256': sha256,
+    }
+    meta['chunk_count'] = _chunk_count(meta)
+    with open(os.path.join(job_dir, 'data.part'), 'wb') as part:
+        part.truncate(size)
+    with open(os.path.join(job_dir, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file)
+    return meta
+
+
+# Write one chunk in place; chunks may arrive in any order and may be retried
+def write_chunk(upload_id, index, data, checksum):
+    """Verify a chunk's SHA-256 and write it at its offset in the assembly file."""
+    job_dir, meta = _load_meta(upload_id)
+    if not 0 <= index < meta['chunk_count']:
+        raise ChunkError(f"Chunk index out of range: {index}")
+    offset = index * meta['chunk_size']
+    expected_length = min(meta['chunk_size'], meta['size'] - offset)
+    if len(data) != expected_length:
+        raise ChunkError(f"Chunk {index} should be {expected_length} bytes, got {len(data)}")
+    digest = hashlib.sha256(data).hexdigest()
+    if not checksum or digest != checksum.lower():
+        raise ChunkError(f"Checksum mismatch for chunk {index}")
+
+    marker = os.path.join(job_dir, 'chunks', str(index))
+    if os.path.exists(marker):
+        return received_chunks(upload_id)
+    fd = os.open(os.path.join(job_dir, 'data.part'), os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+    # The marker is written last so a crash mid-write leaves the chunk missing, not corrupt
+    with open(marker, 'w') as marker_file:
+        marker_file.write(digest)
+    return received_chunks(upload_id)
+
+
+def received_chunks(upload_id):
+    """Return the sorted indexes of chunks received so far."""
+    job_dir = _job_dir(upload_id)
+    return sorted(int(name) for name in os.listdir(os.path.join(job_dir, 'chunks')) if name.isdigit())
+
+
+def upload_status(upload_id):
+    """Return metadata plus received and missing chunk indexes for resuming."""
+    _, meta = _load_meta(upload_id)
+    received = received_chunks(upload_id)
+    missing = sorted(set(range(meta['chunk_count'])) - set(received))
+    return {**meta, 'received': received, 'missing': missing}
+
+
+# Finish an upload: check completeness and move the file into the job workspace
+def complete_upload(upload_id):
+    """Return a SpooledUpload for the assembled file once every chunk has arrived."""
+    job_dir, meta = _load_meta(upload_id)
+    status = upload_status(upload_id)
+    if status['missing']:
+        raise ChunkError(f"Missing chunks: {status['missing']}")
+
+    path = os.path.join(job_dir, meta['filename'])
+    part_path = os.path.join(job_dir, 'data.part')
+    if os.path.exists(part_path):
+        if meta.get('sha256'):
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as part:
+                for block in iter(lambda: part.read(1 << 20), b''):
+                    digest.update(block)
+            if digest.hexdigest() != meta['sha256'].lower():
+                raise ChunkError("Checksum mismatch for assembled file")
+        os.replace(part_path, path)
+    return SpooledUpload(path, meta['filename'], remove=False)
+
+
+def discard_upload(upload_id):
+    """Delete an upload's workspace."""
+    shutil.rmtree(_job_dir(upload_id), ignore_errors=True)
+
+
+# Remove workspaces of uploads that were abandoned or never cleaned up
+def sweep_expired(max_age=UPLOAD_TTL_SECONDS):
+    """Delete workspaces whose last chunk arrived more than max_age seconds ago."""
+    if not os.path.isdir(WORKSPACE_DIR):
+        return []
+    cutoff = time.time() - max_age
+    removed = []
+    for upload_id in os.listdir(WORKSPACE_DIR):
+        job_dir = os.path.join(WORKSPACE_DIR, upload_id)
+        try:
+            # Writing a chunk marker touches chunks/, so its mtime is the last activity
+            last_activity = os.path.getmtime(os.path.join(job_dir, 'chunks'))
+        except OSError:
+            last_activity = os.path.getmtime(job_dir) if os.path.isdir(job_dir) else time.time()
+        if last_activity < cutoff:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            removed.append(upload_id)
+    return removed
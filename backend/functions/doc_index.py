@@ -0,0 +1,294 @@
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from docx import Document
+from PyPDF2 import PdfFileReader
+
+# Location of the SQLite metadata/full-text index
+INDEX_PATH = os.environ.get('EBC_INDEX_PATH', 'ebc_index.sqlite3')
+
+INDEXED_EXTENSIONS = ('.pdf', '.docx')
+
+# Directory /index_directory may ingest from; unset keeps bulk ingest off the HTTP API
+INGEST_ROOT = os.environ.get('EBC_INGEST_ROOT')
+
+# Extracted records written per index transaction during bulk ingest
+INGEST_BATCH_SIZE = 32
+
+# Tolerance (inches) when matching a trim size such as 6x9
+TRIM_TOLERANCE = 0.05
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    sha256 TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    subject TEXT,
+    keywords TEXT,
+    page_count INTEGER,
+    page_width_in REAL,
+    page_height_in REAL,
+    size_bytes INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE INDEX IF NOT EXISTS documents_trim ON documents (page_width_in, page_height_in);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5 (title, author, subject, keywords, text);
+'''
+
+
+def file_sha256(file, chunk_size=1 << 20):
+    """Hash a path or binary file object without loading it all in memory."""
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    else:
+        position = file.tell()
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+        file.seek(position)
+    return digest.hexdigest()
+
+
+def _info_value(info, key):
+    # dict.get skips PyPDF2's indirect-object resolution, so resolve and coerce here
+    value = info.get(key)
+    if value is None:
+        return None
+    value = value.getObject() if hasattr(value, 'getObject') else value
+    return str(value)
+
+
+def _pdf_record(file, text=None):
+    reader = PdfFileReader(file)
+    info = reader.getDocumentInfo() or {}
+    page_count = reader.getNumPages()
+    width = height = None
+    if page_count:
+        box = reader.getPage(0).mediaBox
+        width = round(float(box.getWidth()) / 72, 2)
+        height = round(float(box.getHeight()) / 72, 2)
+    if text is None:
+        text = '\n'.join(reader.getPage(i).extractText() for i in range(page_count))
+    return {
+        'file_type': 'pdf',
+        'title': _info_value(info, '/Title'),
+        'author': _info_value(info, '/Author'),
+        'subject': _info_value(info, '/Subject'),
+        'keywords': _info_value(info, '/Keywords'),
+        'page_count': page_count,
+        'page_width_in': width,
+        'page_height_in': height,
+        'text': text,
+    }
+
+
+def _docx_record(file, text=None):
+    doc = Document(file)
+    props = doc.core_properties
+    width = height = None
+    if doc.sections and doc.sections[0].page_width:
+        width = round(doc.sections[0].page_width.inches, 2)
+        height = round(doc.sections[0].page_height.inches, 2)
+    return {
+        'file_type': 'docx',
+        'title': props.title,
+        'author': props.author,
+        'subject': props.subject,
+        'keywords': props.keywords,
+        # DOCX has no fixed pagination until it is laid out
+        'page_count': None,
+        'page_width_in': width,
+        'page_height_in': height,
+        'text': text if text is not None else '\n'.join(para.text for para in doc.paragraphs),
+    }
+
+
+# Extract the indexable record for one PDF or DOCX (path or file object)
+def extract_record(file, filename=None, text=None, sha256=None):
+    """Extract metadata, page size, page count and text from a PDF or DOCX file.
+
+    Pass text or sha256 when already known to skip the text pass or the hashing pass.
+    """
+    filename = filename or str(file)
+    sha256 = sha256 or file_sha256(file)
+    if filename.lower().endswith('.pdf'):
+        record = _pdf_record(file, text)
+    elif filename.lower().endswith('.docx'):
+        record = _docx_record(file, text)
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+    if isinstance(file, (str, os.PathLike)):
+        record['size_bytes'] = os.path.getsize(file)
+    record['path'] = filename
+    record['sha256'] = sha256
+    return record
+
+
+# Quote every term so user input is matched literally instead of parsed as FTS5 syntax
+def fts_query(query):
+    """Turn free text into an FTS5 query matching all of its terms."""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def parse_trim(trim):
+    """Parse a trim size such as '6x9' into (width, height) inches."""
+    try:
+        width, height = (float(value) for value in trim.lower().replace(' ', '').split('x'))
+    except ValueError:
+        raise ValueError(f"Invalid trim size: {trim!r} (expected e.g. '6x9')")
+    return width, height
+
+
+def _safe_extract(args):
+    path, indexed_sha256 = args
+    try:
+        # Hashing happens here, in the worker, so the request thread never reads file contents
+        sha256 = file_sha256(path)
+        if sha256 == indexed_sha256:
+            return {'path': path, 'unchanged': True}
+        return extract_record(path, sha256=sha256)
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+
+
+class DocumentIndex:
+    """Persistent SQLite/FTS5 index of processed documents."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def indexed_files(self):
+        """Return a mapping of indexed path to (content hash, size in bytes)."""
+        with self._connect() as conn:
+            return {
+                row['path']: (row['sha256'], row['size_bytes'])
+                for row in conn.execute('SELECT path, sha256, size_bytes FROM documents')
+            }
+
+    def add(self, record, conn=None):
+        """Insert or replace one extracted document record."""
+        if conn is None:
+            with self._connect() as conn:
+                return self.add(record, conn)
+        existing = conn.execute('SELECT id FROM documents WHERE path = ?', (record['path'],)).fetchone()
+        if existing is not None:
+            conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (existing['id'],))
+            conn.execute('DELETE FROM documents WHERE id = ?', (existing['id'],))
+        cursor = conn.execute(
+            'INSERT INTO documents (path, sha256, file_type, title, author, subject, keywords, page_count, '
+            'page_width_in, page_height_in, size_bytes, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                record['path'], record['sha256'], record['file_type'], record.get('title'), record.get('author'),
+                record.get('subject'), record.get('keywords'), record.get('page_count'), record.get('page_width_in'),
+                record.get('page_height_in'), record.get('size_bytes'), time.time(),
+            ),
+        )
+        conn.execute(
+            'INSERT INTO documents_fts (rowid, title, author, subject, keywords, text) VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                cursor.lastrowid, record.get('title') or '', record.get('author') or '', record.get('subject') or '',
+                record.get('keywords') or '', record.get('text') or '',
+            ),
+        )
+        return cursor.lastrowid
+
+    def ingest_directory(self, directory, workers=None, recursive=True):
+        """Index every PDF/DOCX under a directory, extracting in a process pool."""
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(INDEXED_EXTENSIONS))
+            if not recursive:
+                break
+
+        # A size change means new content; same-sized files are hashed by the workers
+        indexed = self.indexed_files()
+        jobs = []
+        for path in paths:
+            sha256, size = indexed.get(path, (None, None))
+            jobs.append((path, sha256 if size == os.path.getsize(path) else None))
+
+        summary = {'found': len(paths), 'indexed': 0, 'skipped': 0, 'errors': []}
+        if not jobs:
+            return summary
+        batch = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for record in pool.map(_safe_extract, jobs, chunksize=4):
+                if 'error' in record:
+                    summary['errors'].append(record)
+                elif record.get('unchanged'):
+                    summary['skipped'] += 1
+                else:
+                    batch.append(record)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    self._add_batch(batch, summary)
+                    batch = []
+        self._add_batch(batch, summary)
+        return summary
+
+    def _add_batch(self, records, summary):
+        # Short transactions keep the index writable for uploads during a long ingest
+        if not records:
+            return
+        with self._connect() as conn:
+            for record in records:
+                conn.execute('SAVEPOINT record')
+                try:
+                    self.add(record, conn)
+                except sqlite3.Error as e:
+                    conn.execute('ROLLBACK TO record')
+                    summary['errors'].append({'path': record['path'], 'error': str(e)})
+                else:
+                    summary['indexed'] += 1
+                finally:
+                    conn.execute('RELEASE record')
+
+    def search(self, query=None, trim=None, author=None, limit=50):
+        """Search indexed documents by full text, trim size (e.g. '6x9') and author."""
+        sql = [
+            'SELECT d.path, d.file_type, d.title, d.author, d.page_count, d.page_width_in, d.page_height_in'
+        ]
+        params = []
+        query = fts_query(query) if query else ''
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        if query:
+            sql[0] += ", snippet(documents_fts, 4, '[', ']', '...', 12) AS snippet"
+            sql.append('FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid WHERE documents_fts MATCH ?')
+            params.append(query)
+        else:
+            sql.append('FROM documents d WHERE 1 = 1')
+        if trim:
+            width, height = parse_trim(trim)
+            sql.append('AND abs(d.page_width_in - ?) <= ? AND abs(d.page_height_in - ?) <= ?')
+            params.extend([width, TRIM_TOLERANCE, height, TRIM_TOLERANCE])
+        if author:
+            sql.append('AND d.author LIKE ?')
+            params.append(f'%{author}%')
+        sql.append('ORDER BY documents_fts.rank' if query else 'ORDER BY d.indexed_at DESC')
+        sql.append('LIMIT ?')
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(' '.join(sql), params)]
@@ -0,0 +1,265 @@
+import io
+import os
+import queue
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.table import Table as DocxTable
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph as DocxParagraph
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Image as RLImage
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+EMU_PER_POINT = 12700
+
+# Default padding of reportlab's page frame
+FRAME_PADDING = 6
+
+NAMESPACES = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+}
+
+# Word paragraph alignment values mapped to reportlab alignments
+ALIGNMENTS = {0: TA_LEFT, 1: TA_CENTER, 2: TA_RIGHT, 3: TA_JUSTIFY}
+
+# Word style names mapped to the reportlab sample stylesheet
+STYLE_NAMES = {
+    'Title': 'Title',
+    'Heading 1': 'Heading1',
+    'Heading 2': 'Heading2',
+    'Heading 3': 'Heading3',
+    'Heading 4': 'Heading4',
+    'Heading 5': 'Heading5',
+    'Heading 6': 'Heading6',
+}
+
+_stylesheet = getSampleStyleSheet()
+
+
+# Build (once) the reportlab style for a Word style name and alignment
+@lru_cache(maxsize=256)
+def paragraph_style(style_name, alignment=None):
+    """Return a cached reportlab ParagraphStyle for a Word paragraph style."""
+    base = _stylesheet[STYLE_NAMES.get(style_name, 'BodyText')]
+    return ParagraphStyle(
+        f'{base.name}-{style_name}-{alignment}',
+        parent=base,
+        alignment=ALIGNMENTS.get(alignment, base.alignment),
+    )
+
+
+def _run_markup(run):
+    text = escape(run.text)
+    if not text:
+        return ''
+    if run.bold:
+        text = f'<b>{text}</b>'
+    if run.italic:
+        text = f'<i>{text}</i>'
+    if run.underline:
+        text = f'<u>{text}</u>'
+    return text
+
+
+def _paragraph_markup(paragraph):
+    # paragraph.runs skips runs nested in w:hyperlink, so walk the inner content instead
+    parts = []
+    for item in paragraph.iter_inner_content():
+        if isinstance(item, Hyperlink):
+            text = ''.join(_run_markup(run) for run in item.runs)
+            if text and item.address:
+                text = f'<a href="{escape(item.url, {chr(34): "&quot;"})}" color="blue">{text}</a>'
+            parts.append(text)
+        else:
+            parts.append(_run_markup(item))
+    return ''.join(parts)
+
+
+def _paragraph_images(paragraph, doc, max_width, max_height):
+    images = []
+    for drawing in paragraph._element.findall('.//wp:inline', NAMESPACES) + paragraph._element.findall('.//wp:anchor', NAMESPACES):
+        blip = drawing.find('.//a:blip', NAMESPACES)
+        extent = drawing.find('wp:extent', NAMESPACES)
+        if blip is None:
+            continue
+        rel_id = blip.get(f'{{{NAMESPACES["r"]}}}embed')
+        part = doc.part.related_parts.get(rel_id)
+        if part is None:
+            continue
+        if extent is not None:
+            width = int(extent.get('cx')) / EMU_PER_POINT
+            height = int(extent.get('cy')) / EMU_PER_POINT
+        else:
+            width, height = ImageReader(io.BytesIO(part.blob)).getSize()
+        # Shrink (never enlarge) to fit the frame in both directions
+        scale = min(1, max_width / width, max_height / height) if width and height else 1
+        images.append(RLImage(io.BytesIO(part.blob), width=width * scale, height=height * scale))
+    return images
+
+
+def _render_paragraph(paragraph, doc, max_width, max_height):
+    flowables = []
+    markup = _paragraph_markup(paragraph)
+    style_name = paragraph.style.name if paragraph.style is not None else 'Normal'
+    alignment = int(paragraph.alignment) if paragraph.alignment is not None else None
+    if markup.strip():
+        flowables.append(Paragraph(markup, paragraph_style(style_name, alignment)))
+    flowables.extend(_paragraph_images(paragraph, doc, max_width, max_height))
+    if not flowables:
+        flowables.append(Spacer(1, paragraph_style(style_name).leading / 2))
+    return flowables
+
+
+def _render_table(table, max_width):
+    cell_style = paragraph_style('Normal')
+    data = [
+        [Paragraph(escape(cell.text).replace('\n', '<br/>'), cell_style) for cell in row.cells]
+        for row in table.rows
+    ]
+    if not data:
+        return []
+    columns = max(len(row) for row in data)
+    for row in data:
+        row.extend([''] * (columns - len(row)))
+    rendered = Table(data, colWidths=[max_width / columns] * columns, repeatRows=1)
+    rendered.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    return [rendered, Spacer(1, 6)]
+
+
+# Render a DOCX document to PDF in-process with reportlab
+def render_docx_to_pdf(docx_file, pdf_path='converted.pdf'):
+    """Render paragraphs, headings, images and tables of a DOCX file into a PDF."""
+    doc = Document(docx_file)
+    page_size = letter
+    margins = (72, 72, 72, 72)
+    if doc.sections:
+        section = doc.sections[0]
+        if section.page_width and section.page_height:
+            page_size = (section.page_width.pt, section.page_height.pt)
+        margins = tuple(
+            value.pt if value is not None else 72
+            for value in (section.left_margin, section.right_margin, section.top_margin, section.bottom_margin)
+        )
+
+    pdf = SimpleDocTemplate(
+        pdf_path,
+        pagesize=page_size,
+        leftMargin=margins[0],
+        rightMargin=margins[1],
+        topMargin=margins[2],
+        bottomMargin=margins[3],
+        title=doc.core_properties.title or '',
+        author=doc.core_properties.author or '',
+    )
+    # The page frame pads its content on every side
+    max_width = pdf.width - 2 * FRAME_PADDING
+    max_height = pdf.height - 2 * FRAME_PADDING
+
+    # Walk the body in document order so tables stay between their paragraphs
+    story = []
+    for child in doc.element.body.iterchildren():
+        tag = child.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            story.extend(_render_paragraph(DocxParagraph(child, doc), doc, max_width, max_height))
+        elif tag == 'tbl':
+            story.extend(_render_table(DocxTable(child, doc), max_width))
+
+    pdf.build(story)
+    return pdf_path
+
+
+class OfficeWorkerPool:
+    """Pool of persistent headless LibreOffice processes driven over UNO."""
+
+    def __init__(self, size=2, base_port=2002, soffice='soffice'):
+        self.size = size
+        self.base_port = base_port
+        self.soffice = soffice
+        self._processes = []
+        self._ports = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.size):
+                port = self.base_port + i
+                self._processes.append(subprocess.Popen([
+                    self.soffice, '--headless', '--invisible', '--nologo', '--norestore',
+                    f'-env:UserInstallation=file:///tmp/ebc_office_{port}',
+                    f'--accept=socket,host=127.0.0.1,port={port};urp;',
+                ]))
+                self._ports.put(port)
+            self._started = True
+
+    def _desktop(self, port, retries=20):
+        import uno
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        for attempt in range(retries):
+            try:
+                ctx = resolver.resolve(f'uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext')
+                return ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+            except Exception:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.5)
+
+    def convert(self, docx_path, pdf_path):
+        """Convert a document to PDF on one of the pooled office processes."""
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        self._start()
+        port = self._ports.get()
+        try:
+            desktop = self._desktop(port)
+            document = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(docx_path)), '_blank', 0, (prop('Hidden', True),)
+            )
+            try:
+                document.storeToURL(
+                    uno.systemPathToFileUrl(os.path.abspath(pdf_path)), (prop('FilterName', 'writer_pdf_Export'),)
+                )
+            finally:
+                document.close(True)
+        finally:
+            self._ports.put(port)
+        return pdf_path
+
+    def close(self):
+        """Terminate all pooled office processes."""
+        with self._lock:
+            for process in self._processes:
+                process.terminate()
+            self._processes = []
+            self._ports = queue.Queue()
+            self._started = False
+
+
+# Set EBC_OFFICE_WORKERS to keep a headless office pool as fallback renderer
+OFFICE_WORKERS = int(os.environ.get('EBC_OFFICE_WORKERS', '0'))
+office_pool = OfficeWorkerPool(size=OFFICE_WORKERS) if OFFICE_WORKERS > 0 else None
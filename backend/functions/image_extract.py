@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+# Fewer unique images than this are extracted in-process
+PARALLEL_THRESHOLD = 16
+
+
+# Map every page to the xrefs it draws, without decoding any image data
+def collect_page_xrefs(pdf_path):
+    """Return a list (one entry per page) of the image xrefs used on that page."""
+    with fitz.open(pdf_path) as doc:
+        return [[img[0] for img in doc.get_page_images(page_num, full=True)] for page_num in range(len(doc))]
+
+
+def _extract_xrefs(args):
+    pdf_path, xrefs, output_dir, min_bytes, min_pixels = args
+    results = {}
+    with fitz.open(pdf_path) as doc:
+        for xref in xrefs:
+            base_image = doc.extract_image(xref)
+            if not base_image:
+                continue
+            image_bytes = base_image['image']
+            width, height = base_image.get('width', 0), base_image.get('height', 0)
+            if len(image_bytes) < min_bytes or width * height < min_pixels:
+                results[xref] = None
+                continue
+            digest = hashlib.sha256(image_bytes).hexdigest()
+            image_path = os.path.join(output_dir, f"{digest[:16]}.{base_image['ext']}")
+            # Identical content from different xrefs lands on the same file
+            if not os.path.exists(image_path):
+                tmp_path = f'{image_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as image_file:
+                    image_file.write(image_bytes)
+                os.replace(tmp_path, image_path)
+            results[xref] = {
+                'path': image_path,
+                'sha256': digest,
+                'width': width,
+                'height': height,
+                'bytes': len(image_bytes),
+            }
+    return results
+
+
+# Extract each unique image once and write a page -> image manifest
+def extract_unique_images(pdf_path, output_dir='extracted_images', workers=None, min_bytes=0, min_pixels=0,
+                          manifest_name='manifest.json'):
+    """Extract images deduplicated by xref and content hash, fanning out across processes."""
+    os.makedirs(output_dir, exist_ok=True)
+    page_xrefs = collect_page_xrefs(pdf_path)
+
+    unique_xrefs = list(dict.fromkeys(xref for xrefs in page_xrefs for xref in xrefs))
+    workers = workers or os.cpu_count() or 1
+    if len(unique_xrefs) < PARALLEL_THRESHOLD or workers == 1:
+        extracted = _extract_xrefs((pdf_path, unique_xrefs, output_dir, min_bytes, min_pixels))
+    else:
+        # Contiguous chunks keep each worker on neighbouring pages
+        chunk_size = -(-len(unique_xrefs) // workers)
+        chunks = [unique_xrefs[i:i + chunk_size] for i in range(0, len(unique_xrefs), chunk_size)]
+        extracted = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for results in pool.map(_extract_xrefs, [(pdf_path, chunk, output_dir, min_bytes, min_pixels) for chunk in chunks]):
+                extracted.update(results)
+
+    images = {}
+    pages = {}
+    for page_num, xrefs in enumerate(page_xrefs, start=1):
+        page_images = []
+        for xref in xrefs:
+            info = extracted.get(xref)
+            if info is None:
+                continue
+            name = os.path.basename(info['path'])
+            entry = images.setdefault(name, {
+                'sha256': info['sha256'],
+                'width': info['width'],
+                'height': info['height'],
+                'bytes': info['bytes'],
+                'xrefs': [],
+                'pages': [],
+            })
+            if xref not in entry['xrefs']:
+                entry['xrefs'].append(xref)
+            if page_num not in entry['pages']:
+                entry['pages'].append(page_num)
+            if name not in page_images:
+                page_images.append(name)
+        pages[str(page_num)] = page_images
+
+    manifest = {'source': os.path.basename(pdf_path), 'pages': pages, 'images': images}
+    manifest_path = os.path.join(output_dir, manifest_name)
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return [os.path.join(output_dir, name) for name in images], manifest_path
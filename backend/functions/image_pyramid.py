@@ -0,0 +1,107 @@
+import os
+import threading
+
+from PIL import Image
+
+# Levels are halved down to this size (pixels on the longer side)
+MIN_LEVEL_SIZE = 64
+
+# Number of source images whose pyramids are kept in memory
+MAX_CACHED_PYRAMIDS = 8
+
+# Memory budget for cached pyramids, configurable with EBC_PYRAMID_CACHE_MB
+MAX_CACHE_BYTES = int(os.environ.get('EBC_PYRAMID_CACHE_MB', '256')) * 1024 * 1024
+
+_pyramids = {}
+_lock = threading.Lock()
+
+
+def _decode(image_path, min_width, min_height):
+    """Decode an image and reduce it to the smallest size that still covers the target."""
+    img = Image.open(image_path)
+    full_size = img.size
+    if img.format == 'JPEG':
+        # JPEG can skip straight to a smaller DCT scale while decoding
+        img.draft('RGB', (min_width, min_height))
+    img.load()
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGB')
+    # Other formats decode at full size, so shrink them before they are cached
+    factor = min(img.width // max(min_width, 1), img.height // max(min_height, 1))
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img, full_size
+
+
+def _build_levels(base):
+    levels = [base]
+    while max(levels[-1].size) // 2 >= MIN_LEVEL_SIZE:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def _pyramid_bytes(pyramid):
+    return sum(level.width * level.height * len(level.getbands()) for level in pyramid['levels'])
+
+
+def _pyramid(image_path, min_width, min_height):
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        pyramid = _pyramids.get(key)
+    base = pyramid['levels'][0] if pyramid else None
+    # Rebuild only when a larger target needs more detail than the cached base was decoded with
+    if pyramid is None or (base.size != pyramid['full_size'] and (base.width < min_width or base.height < min_height)):
+        base, full_size = _decode(image_path, min_width, min_height)
+        pyramid = {'levels': _build_levels(base), 'full_size': full_size}
+        pyramid['bytes'] = _pyramid_bytes(pyramid)
+        with _lock:
+            _pyramids.pop(key, None)
+            # Evict oldest first until both the count and the byte budget fit
+            while _pyramids and (
+                len(_pyramids) >= MAX_CACHED_PYRAMIDS
+                or sum(p['bytes'] for p in _pyramids.values()) + pyramid['bytes'] > MAX_CACHE_BYTES
+            ):
+                _pyramids.pop(next(iter(_pyramids)))
+            if pyramid['bytes'] <= MAX_CACHE_BYTES:
+                _pyramids[key] = pyramid
+    return pyramid
+
+
+def _nearest_level(levels, width, height):
+    # Smallest level that is still at least as large as the requested size
+    for level in reversed(levels):
+        if level.width >= width and level.height >= height:
+            return level
+    return levels[0]
+
+
+# Resize and center an image on a white canvas, sampling from a cached pyramid
+def fit_image(image_path, target_width, target_height, keep_aspect_ratio=True):
+    """Return an in-memory image of the target size with the source resized into it."""
+    target_width, target_height = int(target_width), int(target_height)
+    with Image.open(image_path) as probe:
+        original_width, original_height = probe.size
+
+    if keep_aspect_ratio:
+        ratio = min(target_width / original_width, target_height / original_height)
+        new_width = max(1, int(original_width * ratio))
+        new_height = max(1, int(original_height * ratio))
+    else:
+        new_width, new_height = target_width, target_height
+
+    levels = _pyramid(image_path, new_width, new_height)['levels']
+    img = _nearest_level(levels, new_width, new_height).resize((new_width, new_height), Image.LANCZOS)
+
+    new_img = Image.new('RGB', (target_width, target_height), (255, 255, 255))
+    paste_x = (target_width - new_width) // 2
+    paste_y = (target_height - new_height) // 2
+    new_img.paste(img, (paste_x, paste_y), img if img.mode == 'RGBA' else None)
+    return new_img
+
+
+def clear_cache():
+    """Drop all cached pyramids."""
+    with _lock:
+        _pyramids.clear()
+
@@ -0,0 +1,251 @@
+import cProfile
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+# Histogram bucket boundaries (seconds) for stage and request timings
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Histogram bucket boundaries (bytes) for per-request memory
+MEMORY_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(4, 14))
+
+# Set EBC_TRACE_MEMORY=1 to also record Python heap peaks per request with tracemalloc (slower)
+TRACE_MEMORY = os.environ.get('EBC_TRACE_MEMORY') == '1'
+
+# Set EBC_PROFILE_DIR to allow per-request cProfile dumps (opt in with ?profile=1 or X-Profile: 1)
+PROFILE_DIR = os.environ.get('EBC_PROFILE_DIR')
+
+_lock = threading.Lock()
+_local = threading.local()
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+# Add to a monotonically increasing counter
+def inc(name, value=1, **labels):
+    """Increment a counter metric."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# Record one observation into a histogram
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    """Record an observation into a histogram metric."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'bounds': buckets, 'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(hist['bounds']):
+            if value <= bound:
+                hist['buckets'][i] += 1
+        hist['sum'] += value
+        hist['count'] += 1
+
+
+# Keep the highest value seen for a gauge
+def set_max(name, value, **labels):
+    """Raise a gauge metric to value if it is higher than the current one."""
+    key = _key(name, labels)
+    with _lock:
+        if value > _gauges.get(key, 0):
+            _gauges[key] = value
+
+
+@contextmanager
+def stage(name):
+    """Time a processing stage (parse, extract, compress, epub, mobi, ...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('ebc_stage_seconds', elapsed, stage=name)
+        collector = getattr(_local, 'timings', None)
+        if collector is not None:
+            collector[name] = collector.get(name, 0.0) + elapsed
+        if has_request_context():
+            timings = g.setdefault('stage_timings', {})
+            timings[name] = timings.get(name, 0.0) + elapsed
+            _sample_request_rss()
+
+
+@contextmanager
+def collect_timings():
+    """Collect stage timings of the current thread outside a request (e.g. batch builds)."""
+    previous = getattr(_local, 'timings', None)
+    _local.timings = {}
+    try:
+        yield _local.timings
+    finally:
+        _local.timings = previous
+
+
+# Count bytes read or produced by a stage
+def record_bytes(direction, count, stage='request'):
+    """Record bytes in ('in') or out ('out') for a stage."""
+    inc('ebc_bytes_total', count, direction=direction, stage=stage)
+
+
+# Count bytes of a file produced on disk
+def record_output_file(path, stage):
+    """Record the size of an output file as bytes out."""
+    if path and os.path.exists(path):
+        record_bytes('out', os.path.getsize(path), stage=stage)
+
+
+# Count pages handled by a stage
+def record_pages(count, stage):
+    """Record the number of pages processed by a stage."""
+    inc('ebc_pages_total', count, stage=stage)
+    if has_request_context():
+        g.page_count = g.get('page_count', 0) + count
+
+
+def _peak_rss_bytes():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _current_rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to the lifetime high-water mark
+        return _peak_rss_bytes()
+
+
+def _sample_request_rss():
+    # Sampled at request start, after every stage and at request end
+    g.rss_peak = max(g.get('rss_peak', 0), _current_rss_bytes())
+
+
+def _profiling_requested():
+    if not PROFILE_DIR:
+        return False
+    return request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    _sample_request_rss()
+    if TRACE_MEMORY:
+        # Heap peak is process wide, so concurrent requests inflate each other's figure
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        g.heap_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    if request.content_length:
+        record_bytes('in', request.content_length, stage=request.endpoint or 'unknown')
+    if _profiling_requested():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _after_request(response):
+    endpoint = request.endpoint or 'unknown'
+    profile_path = _stop_profiler(endpoint)
+    if profile_path:
+        response.headers['X-Profile-Path'] = profile_path
+
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    observe('ebc_request_seconds', elapsed, endpoint=endpoint)
+    inc('ebc_requests_total', endpoint=endpoint, status=str(response.status_code))
+    if response.content_length:
+        record_bytes('out', response.content_length, stage=endpoint)
+
+    _sample_request_rss()
+    observe('ebc_request_peak_rss_bytes', g.rss_peak, buckets=MEMORY_BUCKETS, endpoint=endpoint)
+    set_max('ebc_peak_rss_bytes', _peak_rss_bytes())
+    if TRACE_MEMORY and 'heap_start' in g:
+        heap_peak = tracemalloc.get_traced_memory()[1] - g.heap_start
+        observe('ebc_request_peak_heap_bytes', max(heap_peak, 0), buckets=MEMORY_BUCKETS, endpoint=endpoint)
+
+    timings = g.get('stage_timings')
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()
+        )
+    return response
+
+
+def _stop_profiler(endpoint):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_path = os.path.join(PROFILE_DIR, f'{endpoint}_{int(time.time() * 1000)}.prof')
+    profiler.dump_stats(profile_path)
+    return profile_path
+
+
+def _teardown_request(exc):
+    # after_request is skipped when a view raises; the profiler still has to be stopped
+    _stop_profiler(request.endpoint or 'unknown')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+
+# Render all metrics in the Prometheus text exposition format
+def render_metrics():
+    """Render collected metrics in Prometheus text format."""
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} counter')
+                seen.add(name)
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), value in sorted(_gauges.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} gauge')
+                seen.add(name)
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), hist in sorted(_histograms.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} histogram')
+                seen.add(name)
+            for bound, count in zip(hist['bounds'], hist['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {hist["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {hist["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Hook request timing into a Flask app and expose /metrics
+def init_app(app):
+    """Install request instrumentation and the /metrics endpoint on an app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Expose collected metrics in Prometheus text format."""
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    return app
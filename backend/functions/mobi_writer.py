@@ -0,0 +1,240 @@
+import html
+import os
+import random
+import re
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# PalmDOC text record size
+RECORD_SIZE = 4096
+
+# Books with fewer text records than this are compressed in-process
+PARALLEL_THRESHOLD = 64
+
+MOBI_HEADER_LENGTH = 0xE8
+EOF_RECORD = b'\xe9\x8e\r\n'
+PAGE_BREAK = b'<mbp:pagebreak/>'
+
+# EXTH record types
+EXTH_AUTHOR = 100
+EXTH_PUBLISHER = 101
+EXTH_SUBJECT = 105
+EXTH_UPDATED_TITLE = 503
+EXTH_LANGUAGE = 524
+
+_BODY_RE = re.compile(rb'<body[^>]*>(.*)</body>', re.S | re.I)
+
+
+# PalmDOC (LZ77 variant) compression of one text record
+def palmdoc_compress(data):
+    """Compress one text record with PalmDOC compression."""
+    out = bytearray()
+    i = 0
+    length = len(data)
+    while i < length:
+        # Back-references of 3..10 bytes up to 2047 bytes behind
+        if 10 < i and length - i > 10:
+            match = -1
+            for size in range(10, 2, -1):
+                match = data.rfind(data[i:i + size], max(0, i - 2047), i)
+                if match >= 0:
+                    break
+            if match >= 0:
+                distance = i - match
+                out += struct.pack('>H', 0x8000 + ((distance << 3) & 0x3FF8) + (size - 3))
+                i += size
+                continue
+
+        byte = data[i]
+        i += 1
+        # A space followed by a character in 0x40..0x7F packs into one byte
+        if byte == 0x20 and i < length and 0x40 <= data[i] < 0x80:
+            out.append(data[i] ^ 0x80)
+            i += 1
+            continue
+        if byte == 0 or 8 < byte < 0x80:
+            out.append(byte)
+            continue
+        # Runs of up to 8 bytes that need escaping
+        run = bytearray([byte])
+        while i < length and len(run) < 8 and not (data[i] == 0 or 8 < data[i] < 0x80):
+            run.append(data[i])
+            i += 1
+        out.append(len(run))
+        out += run
+    return bytes(out)
+
+
+def _compress_records(records):
+    return [palmdoc_compress(record) for record in records]
+
+
+def _split_text(text):
+    """Split text into fixed-size records plus the bytes completing a split UTF-8 character."""
+    records = []
+    for start in range(0, len(text), RECORD_SIZE):
+        data = text[start:start + RECORD_SIZE]
+        end = start + len(data)
+        overlap = b''
+        # Continuation bytes (10xxxxxx) at the start of the next record belong to the last character
+        while end + len(overlap) < len(text) and len(overlap) < 3 and (text[end + len(overlap)] & 0xC0) == 0x80:
+            overlap += text[end + len(overlap):end + len(overlap) + 1]
+        records.append((data, overlap))
+    return records
+
+
+def _chapter_body(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    match = _BODY_RE.search(content)
+    if match:
+        return match.group(1)
+    if b'<' not in content:
+        # Plain text: one paragraph per line
+        return b''.join(
+            b'<p>' + html.escape(line.decode('utf-8')).encode('utf-8') + b'</p>'
+            for line in content.splitlines() if line.strip()
+        )
+    return content
+
+
+def _book_chapters(book):
+    """Yield chapter HTML bodies of an ebooklib EpubBook in spine order."""
+    from ebooklib import ITEM_DOCUMENT
+
+    items = {item.get_id(): item for item in book.get_items_of_type(ITEM_DOCUMENT)}
+    spine_ids = [entry[0] if isinstance(entry, tuple) else entry for entry in book.spine]
+    ordered = [items[item_id] for item_id in spine_ids if item_id in items and item_id != 'nav']
+    ordered += [item for item_id, item in items.items() if item_id not in spine_ids and item_id != 'nav']
+    for item in ordered:
+        content = getattr(item, 'content', None) or item.get_content()
+        yield _chapter_body(content)
+
+
+def _book_metadata(book, key):
+    values = book.get_metadata('DC', key)
+    return values[0][0] if values else None
+
+
+def _exth_header(records):
+    body = b''.join(
+        struct.pack('>II', record_type, len(data) + 8) + data
+        for record_type, data in records
+    )
+    header = b'EXTH' + struct.pack('>II', len(body) + 12, len(records)) + body
+    return header + b'\0' * (-len(header) % 4)
+
+
+def _record0(text_length, text_record_count, title, exth_records):
+    title_bytes = title.encode('utf-8')
+    exth = _exth_header(exth_records)
+
+    palmdoc = struct.pack('>HHIHHHH', 2, 0, text_length, text_record_count, RECORD_SIZE, 0, 0)
+
+    mobi = bytearray(b'\xff' * MOBI_HEADER_LENGTH)
+    # Offsets below are relative to the start of record 0
+    def put(offset, fmt, *values):
+        struct.pack_into(fmt, mobi, offset - 16, *values)
+
+    first_non_book = text_record_count + 1
+    put(16, '>4sIIII', b'MOBI', MOBI_HEADER_LENGTH, 2, 65001, random.getrandbits(32))
+    put(36, '>I', 6)
+    put(80, '>I', first_non_book)
+    put(84, '>II', 16 + MOBI_HEADER_LENGTH + len(exth), len(title_bytes))
+    put(92, '>III', 9, 0, 0)
+    put(104, '>I', 6)
+    put(108, '>I', 0xFFFFFFFF)
+    put(112, '>IIII', 0, 0, 0, 0)
+    put(128, '>I', 0x40)
+    mobi[132 - 16:164 - 16] = b'\0' * 32
+    put(168, '>IIII', 0xFFFFFFFF, 0, 0, 0)
+    put(184, '>II', 0, 0)
+    put(192, '>HHI', 1, text_record_count, 1)
+    put(200, '>II', first_non_book + 1, 1)
+    put(208, '>II', first_non_book, 1)
+    put(216, '>II', 0, 0)
+    put(228, '>I', 0)
+    # Trailing entries: bit 0 = multibyte character overlap
+    put(240, '>HHI', 0, 1, 0xFFFFFFFF)
+
+    record = palmdoc + bytes(mobi) + exth + title_bytes
+    return record + b'\0' * (-len(record) % 4 + 4)
+
+
+def _flis_record():
+    return (b'FLIS\0\0\0\x08\0\x41\0\0\0\0\0\0\xff\xff\xff\xff\0\x01\0\x03\0\0\0\x03\0\0\0\x01'
+            + b'\xff' * 4)
+
+
+def _fcis_record(text_length):
+    return (b'FCIS\0\0\0\x14\0\0\0\x10\0\0\0\x01\0\0\0\0' + struct.pack('>I', text_length)
+            + b'\0\0\0\0\0\0\0\x20\0\0\0\x08\0\x01\0\x01\0\0\0\0')
+
+
+def _pdb_header(name, record_count):
+    now = int(time.time()) + 2082844800  # Palm epoch (1904)
+    name = re.sub(rb'[^A-Za-z0-9]+', b'_', name.encode('ascii', 'ignore'))[:31] or b'book'
+    return struct.pack(
+        '>32sHHIIIIII4s4sIIH',
+        name.ljust(32, b'\0'), 0, 0, now, now, 0, 0, 0, 0, b'BOOK', b'MOBI',
+        2 * record_count - 1, 0, record_count,
+    )
+
+
+# Write a MOBI file straight from an in-memory EPUB book or a chapter stream
+def write_mobi(source, output_path='sample.mobi', title=None, author=None, language='en', workers=None):
+    """Write a PalmDOC-compressed MOBI from an ebooklib EpubBook or an iterable of chapter HTML."""
+    if hasattr(source, 'get_items_of_type'):
+        title = title or _book_metadata(source, 'title')
+        author = author or _book_metadata(source, 'creator')
+        language = _book_metadata(source, 'language') or language
+        chapters = _book_chapters(source)
+    else:
+        chapters = (_chapter_body(chapter) for chapter in source)
+    title = title or 'Untitled'
+
+    text = (b'<html><head><guide></guide></head><body>'
+            + PAGE_BREAK.join(chapters)
+            + b'</body></html>')
+
+    split = _split_text(text)
+    plain_records = [data for data, _ in split]
+    if len(plain_records) < PARALLEL_THRESHOLD or workers == 1:
+        compressed = _compress_records(plain_records)
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunk_size = -(-len(plain_records) // workers)
+        chunks = [plain_records[i:i + chunk_size] for i in range(0, len(plain_records), chunk_size)]
+        compressed = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_compress_records, chunks):
+                compressed.extend(result)
+    text_records = [
+        data + overlap + bytes([len(overlap)])
+        for data, (_, overlap) in zip(compressed, split)
+    ]
+
+    exth_records = [(EXTH_UPDATED_TITLE, title.encode('utf-8')), (EXTH_LANGUAGE, language.encode('utf-8'))]
+    if author:
+        exth_records.append((EXTH_AUTHOR, author.encode('utf-8')))
+
+    records = [_record0(len(text), len(text_records), title, exth_records)]
+    records += text_records
+    records += [_flis_record(), _fcis_record(len(text)), EOF_RECORD]
+
+    # Offsets are known up front, so the file is written in a single pass
+    header = _pdb_header(title, len(records))
+    offset = len(header) + 8 * len(records) + 2
+    record_list = bytearray()
+    for index, record in enumerate(records):
+        record_list += struct.pack('>II', offset, 2 * index)
+        offset += len(record)
+
+    with open(output_path, 'wb') as output_file:
+        output_file.write(header)
+        output_file.write(record_list)
+        output_file.write(b'\0\0')
+        for record in records:
+            output_file.write(record)
+    return output_path
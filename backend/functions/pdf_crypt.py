@@ -0,0 +1,100 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+# Encryption algorithms selectable for batch encryption
+ALGORITHMS = {
+    'aes-256': fitz.PDF_ENCRYPT_AES_256,
+    'aes-128': fitz.PDF_ENCRYPT_AES_128,
+    'rc4-128': fitz.PDF_ENCRYPT_RC4_128,
+}
+
+# Permissions granted to review copies opened with the user password
+DEFAULT_PERMISSIONS = fitz.PDF_PERM_PRINT | fitz.PDF_PERM_ACCESSIBILITY
+
+# Zip entry listing the files that could not be processed
+ERRORS_MANIFEST = 'errors.json'
+
+# Operations batch_crypt_pdfs can run
+CRYPT_MODES = ('encrypt', 'decrypt')
+
+
+def _read_source(source):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype='pdf')
+    return fitz.open(source)
+
+
+# Encrypt one PDF; saving re-writes the existing objects without rebuilding the page tree
+def encrypt_pdf_bytes(source, user_password, owner_password=None, algorithm='aes-256', permissions=DEFAULT_PERMISSIONS):
+    """Encrypt a PDF (path or bytes) and return the encrypted bytes."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    doc = _read_source(source)
+    try:
+        if doc.needs_pass:
+            raise ValueError("PDF is already encrypted")
+        return doc.tobytes(
+            encryption=ALGORITHMS[algorithm],
+            user_pw=user_password,
+            owner_pw=owner_password or user_password,
+            permissions=permissions,
+            garbage=0,
+            deflate=False,
+        )
+    finally:
+        doc.close()
+
+
+# Decrypt one PDF without copying its pages into a new document
+def decrypt_pdf_bytes(source, password):
+    """Decrypt a PDF (path or bytes) and return the decrypted bytes."""
+    doc = _read_source(source)
+    try:
+        if doc.needs_pass and not doc.authenticate(password):
+            raise ValueError("Incorrect password")
+        return doc.tobytes(encryption=fitz.PDF_ENCRYPT_NONE, garbage=0, deflate=False)
+    finally:
+        doc.close()
+
+
+def _crypt_one(job):
+    name, source, mode, options = job
+    try:
+        if mode == 'encrypt':
+            return name, encrypt_pdf_bytes(source, **options), None
+        return name, decrypt_pdf_bytes(source, options['user_password']), None
+    except Exception as e:
+        return name, None, str(e)
+
+
+# Encrypt or decrypt many PDFs concurrently and stream the results into a zip
+def batch_crypt_pdfs(sources, mode, password, owner_password=None, algorithm='aes-256',
+                     output_zip='crypted_pdfs.zip', workers=None):
+    """Encrypt/decrypt (name, path-or-bytes) pairs in a process pool and zip the outputs."""
+    if mode not in CRYPT_MODES:
+        raise ValueError(f"Unsupported mode: {mode}")
+    if mode == 'encrypt' and algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    options = {'user_password': password}
+    if mode == 'encrypt':
+        options.update(owner_password=owner_password, algorithm=algorithm)
+
+    errors = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_STORED) as zipf:
+        futures = [pool.submit(_crypt_one, (name, source, mode, options)) for name, source in sources]
+        # Write each result as soon as it is ready instead of holding the whole batch
+        for future in as_completed(futures):
+            name, data, error = future.result()
+            if error is not None:
+                errors[name] = error
+                continue
+            zipf.writestr(os.path.basename(name), data)
+        # Failures travel inside the archive so the successful outputs are still delivered
+        if errors:
+            zipf.writestr(ERRORS_MANIFEST, json.dumps(errors, indent=2, sort_keys=True))
+    return output_zip, errors
@@ -0,0 +1,154 @@
+import html
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+from functions.doc_index import file_sha256
+
+# Rendered fragments live under <HTML_CACHE_DIR>/<document sha256>/page_<n>.html
+HTML_CACHE_DIR = os.environ.get('EBC_HTML_CACHE_DIR', 'html_pages')
+
+# Pages rendered before the index is returned (and inlined into it)
+EAGER_PAGES = 3
+
+# Fewer pages than this are rendered in-process
+PARALLEL_THRESHOLD = 8
+
+# Finishes the remaining pages after the index has been returned
+_background = ThreadPoolExecutor(max_workers=1)
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ background: #eee; margin: 0; }}
+  .page {{ background: #fff; margin: 16px auto; position: relative; overflow: hidden; }}
+</style>
+</head>
+<body>
+{pages}
+<script>
+  const load = (section) => {{
+    if (section.dataset.loaded) return;
+    section.dataset.loaded = '1';
+    fetch(section.dataset.src)
+      .then((response) => response.text())
+      .then((fragment) => {{ section.innerHTML = fragment; }})
+      .catch(() => {{ delete section.dataset.loaded; }});
+  }};
+  const observer = new IntersectionObserver((entries) => {{
+    entries.forEach((entry) => {{
+      if (entry.isIntersecting) {{
+        load(entry.target);
+        observer.unobserve(entry.target);
+      }}
+    }});
+  }}, {{ rootMargin: '800px 0px' }});
+  document.querySelectorAll('.page[data-src]').forEach((section) => observer.observe(section));
+</script>
+</body>
+</html>
+'''
+
+
+def document_dir(sha256, cache_dir=HTML_CACHE_DIR):
+    return os.path.join(cache_dir, sha256)
+
+
+def page_path(sha256, page_number, cache_dir=HTML_CACHE_DIR):
+    return os.path.join(document_dir(sha256, cache_dir), f'page_{page_number}.html')
+
+
+def _render_pages(args):
+    """Render 1-based page numbers of a PDF to standalone HTML fragments."""
+    pdf_path, page_numbers, out_dir = args
+    with fitz.open(pdf_path) as doc:
+        for page_number in page_numbers:
+            fragment = doc.load_page(page_number - 1).get_text('html')
+            path = os.path.join(out_dir, f'page_{page_number}.html')
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as page_file:
+                page_file.write(fragment)
+            os.replace(tmp_path, path)
+    return page_numbers
+
+
+# Render the given pages into the cache, skipping any already rendered
+def render_pages(pdf_path, out_dir, page_numbers, workers=None):
+    """Render pages that are not yet cached, in parallel for larger batches."""
+    missing = [n for n in page_numbers if not os.path.exists(os.path.join(out_dir, f'page_{n}.html'))]
+    if not missing:
+        return
+    workers = workers or os.cpu_count() or 1
+    if len(missing) < PARALLEL_THRESHOLD or workers == 1:
+        _render_pages((pdf_path, missing, out_dir))
+        return
+    chunk_size = -(-len(missing) // workers)
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_render_pages, [(pdf_path, chunk, out_dir) for chunk in chunks]))
+
+
+# Return one page fragment, rendering it on demand if the background pass has not reached it
+def render_page(sha256, page_number, cache_dir=HTML_CACHE_DIR):
+    """Return the path of a cached page fragment, rendering it if needed."""
+    # load_page(-1) would silently return the last page
+    if page_number < 1:
+        raise IndexError(f"Page numbers start at 1, got {page_number}")
+    out_dir = document_dir(sha256, cache_dir)
+    source = os.path.join(out_dir, 'source.pdf')
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Unknown document: {sha256}")
+    path = page_path(sha256, page_number, cache_dir)
+    if not os.path.exists(path):
+        _render_pages((source, [page_number], out_dir))
+    return path
+
+
+def _index_html(title, page_sizes, out_dir, eager_pages):
+    sections = []
+    for page_number, (width, height) in enumerate(page_sizes, start=1):
+        style = f'width:{width:.0f}pt;min-height:{height:.0f}pt'
+        if page_number <= eager_pages:
+            with open(os.path.join(out_dir, f'page_{page_number}.html'), encoding='utf-8') as page_file:
+                sections.append(f'<section class="page" style="{style}">{page_file.read()}</section>')
+        else:
+            sections.append(f'<section class="page" style="{style}" data-src="page_{page_number}.html"></section>')
+    return INDEX_TEMPLATE.format(title=html.escape(title), pages='\n'.join(sections))
+
+
+# Convert a PDF into a lazy-loading HTML index plus one fragment per page
+def convert_pdf_to_html(pdf_path, cache_dir=HTML_CACHE_DIR, eager_pages=EAGER_PAGES, background=True, workers=None):
+    """Render the first pages immediately and the rest in the background; return (sha256, index path)."""
+    sha256 = file_sha256(pdf_path)
+    out_dir = document_dir(sha256, cache_dir)
+    index_path = os.path.join(out_dir, 'index.html')
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Keep a private copy so pages can be rendered after the upload is gone
+    source = os.path.join(out_dir, 'source.pdf')
+    if not os.path.exists(source):
+        shutil.copyfile(pdf_path, source)
+
+    with fitz.open(source) as doc:
+        page_sizes = [(page.rect.width, page.rect.height) for page in doc]
+    page_numbers = list(range(1, len(page_sizes) + 1))
+    eager = page_numbers[:eager_pages]
+    rest = page_numbers[eager_pages:]
+
+    render_pages(source, out_dir, eager, workers=1)
+    if not os.path.exists(index_path):
+        index = _index_html(os.path.basename(pdf_path), page_sizes, out_dir, len(eager))
+        with open(index_path, 'w', encoding='utf-8') as index_file:
+            index_file.write(index)
+
+    if rest:
+        if background:
+            _background.submit(render_pages, source, out_dir, rest, workers)
+        else:
+            render_pages(source, out_dir, rest, workers)
+    return sha256, index_path
@@ -0,0 +1,293 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+import fitz  # PyMuPDF
+from pptx import Presentation
+from pptx.enum.dml import MSO_COLOR_TYPE, MSO_FILL, MSO_THEME_COLOR
+from pptx.enum.shapes import MSO_SHAPE, MSO_SHAPE_TYPE
+from pptx.enum.text import MSO_AUTO_SIZE, PP_ALIGN
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import qn
+from pptx.shapes.picture import Picture
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, KeepInFrame, Paragraph, Table, TableStyle
+
+EMU_PER_POINT = 12700
+
+DEFAULT_FONT_SIZE = 18
+
+# Used when a styled shape's theme colour cannot be resolved (Office default blue)
+DEFAULT_FILL = '#4472C4'
+DEFAULT_STROKE = '#2F528F'
+
+# Theme colour slots, as named in a theme's clrScheme
+THEME_SLOTS = {
+    MSO_THEME_COLOR.ACCENT_1: 'accent1',
+    MSO_THEME_COLOR.ACCENT_2: 'accent2',
+    MSO_THEME_COLOR.ACCENT_3: 'accent3',
+    MSO_THEME_COLOR.ACCENT_4: 'accent4',
+    MSO_THEME_COLOR.ACCENT_5: 'accent5',
+    MSO_THEME_COLOR.ACCENT_6: 'accent6',
+    MSO_THEME_COLOR.DARK_1: 'dk1',
+    MSO_THEME_COLOR.DARK_2: 'dk2',
+    MSO_THEME_COLOR.LIGHT_1: 'lt1',
+    MSO_THEME_COLOR.LIGHT_2: 'lt2',
+    MSO_THEME_COLOR.TEXT_1: 'dk1',
+    MSO_THEME_COLOR.TEXT_2: 'dk2',
+    MSO_THEME_COLOR.BACKGROUND_1: 'lt1',
+    MSO_THEME_COLOR.BACKGROUND_2: 'lt2',
+    MSO_THEME_COLOR.HYPERLINK: 'hlink',
+    MSO_THEME_COLOR.FOLLOWED_HYPERLINK: 'folHlink',
+}
+
+# Scheme aliases used in shape style references
+SCHEME_ALIASES = {'tx1': 'dk1', 'tx2': 'dk2', 'bg1': 'lt1', 'bg2': 'lt2'}
+
+# Fewer slides than this are rendered in-process
+PARALLEL_THRESHOLD = 8
+
+ALIGNMENTS = {
+    PP_ALIGN.LEFT: TA_LEFT,
+    PP_ALIGN.CENTER: TA_CENTER,
+    PP_ALIGN.RIGHT: TA_RIGHT,
+    PP_ALIGN.JUSTIFY: TA_JUSTIFY,
+}
+
+
+def _pt(emu):
+    return (emu or 0) / EMU_PER_POINT
+
+
+def _theme_colors(slide, cache):
+    """Return {slot: '#RRGGBB'} from the colour scheme of a slide's theme."""
+    master = slide.slide_layout.slide_master
+    # Part names repeat across decks, so the cache belongs to one presentation
+    key = str(master.part.partname)
+    if key not in cache:
+        scheme = {}
+        try:
+            theme = parse_xml(master.part.part_related_by(RT.THEME).blob)
+        except KeyError:
+            theme = None
+        clr_scheme = theme.find(f".//{qn('a:clrScheme')}") if theme is not None else None
+        for slot in clr_scheme if clr_scheme is not None else ():
+            color = slot[0] if len(slot) else None
+            value = None
+            if color is not None and color.tag == qn('a:srgbClr'):
+                value = color.get('val')
+            elif color is not None and color.tag == qn('a:sysClr'):
+                value = color.get('lastClr')
+            if value:
+                scheme[slot.tag.rsplit('}', 1)[-1]] = f'#{value}'
+        cache[key] = scheme
+    return cache[key]
+
+
+def _rgb_hex(color_format, theme=None):
+    """Return '#RRGGBB' for an explicit or theme color, or None when unset or unresolvable."""
+    try:
+        if color_format.type == MSO_COLOR_TYPE.RGB:
+            return f'#{color_format.rgb}'
+        if color_format.type == MSO_COLOR_TYPE.SCHEME and theme:
+            return theme.get(THEME_SLOTS.get(color_format.theme_color))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return None
+
+
+def _rgb(color_format, theme=None):
+    hex_color = _rgb_hex(color_format, theme)
+    return colors.HexColor(hex_color) if hex_color else None
+
+
+def _style_color(shape, ref, theme, default=None):
+    """Resolve the theme colour a shape's <p:style> assigns through ref (fillRef, lnRef, fontRef)."""
+    style = shape._element.find(qn('p:style'))
+    reference = style.find(qn(f'a:{ref}')) if style is not None else None
+    if reference is None:
+        return None
+    scheme_color = reference.find(qn('a:schemeClr'))
+    slot = scheme_color.get('val') if scheme_color is not None else None
+    hex_color = theme.get(SCHEME_ALIASES.get(slot, slot)) if slot else None
+    if hex_color is None:
+        return colors.HexColor(default) if default else None
+    color = colors.HexColor(hex_color)
+    shade = scheme_color.find(qn('a:shade'))
+    if shade is not None:
+        factor = int(shade.get('val')) / 100000
+        color = colors.Color(color.red * factor, color.green * factor, color.blue * factor)
+    return color
+
+
+def _image_reader(image, cache):
+    # Keyed by content SHA-1, so repeated logos decode once per call
+    reader = cache.get(image.sha1)
+    if reader is None:
+        reader = cache[image.sha1] = ImageReader(io.BytesIO(image.blob))
+    return reader
+
+
+def _box(shape, page_height):
+    left, top = _pt(shape.left), _pt(shape.top)
+    width, height = _pt(shape.width), _pt(shape.height)
+    return left, page_height - top - height, width, height
+
+
+def _draw_autoshape(pdf, shape, x, y, width, height, theme):
+    fill = None
+    if shape.fill.type == MSO_FILL.SOLID:
+        fill = _rgb(shape.fill.fore_color, theme) or colors.HexColor(DEFAULT_FILL)
+    elif shape.fill.type is None:
+        # No explicit fill: the shape style's theme reference applies
+        fill = _style_color(shape, 'fillRef', theme, DEFAULT_FILL)
+    stroke = None
+    if shape.line.fill.type == MSO_FILL.SOLID:
+        stroke = _rgb(shape.line.color, theme) or colors.HexColor(DEFAULT_STROKE)
+    elif shape.line.fill.type is None:
+        stroke = _style_color(shape, 'lnRef', theme, DEFAULT_STROKE)
+    if fill is None and stroke is None:
+        return
+    pdf.saveState()
+    if fill is not None:
+        pdf.setFillColor(fill)
+    if stroke is not None:
+        pdf.setStrokeColor(stroke)
+        pdf.setLineWidth(shape.line.width.pt if shape.line.width else 0.75)
+    shape_type = shape.auto_shape_type
+    if shape_type in (MSO_SHAPE.OVAL,):
+        pdf.ellipse(x, y, x + width, y + height, stroke=stroke is not None, fill=fill is not None)
+    elif shape_type in (MSO_SHAPE.ROUNDED_RECTANGLE,):
+        pdf.roundRect(x, y, width, height, min(width, height) / 6, stroke=stroke is not None, fill=fill is not None)
+    else:
+        pdf.rect(x, y, width, height, stroke=stroke is not None, fill=fill is not None)
+    pdf.restoreState()
+
+
+def _paragraph_markup(paragraph, theme, default_color=None):
+    parts = []
+    for run in paragraph.runs:
+        text = escape(run.text)
+        if not text:
+            continue
+        font = run.font
+        attributes = [f'size="{font.size.pt if font.size else DEFAULT_FONT_SIZE}"']
+        color = (_rgb_hex(font.color, theme) if font.color.type is not None else None) or default_color
+        if color is not None:
+            attributes.append(f'color="{color}"')
+        text = f'<font {" ".join(attributes)}>{text}</font>'
+        if font.bold:
+            text = f'<b>{text}</b>'
+        if font.italic:
+            text = f'<i>{text}</i>'
+        parts.append(text)
+    return ''.join(parts)
+
+
+def _draw_text_frame(pdf, text_frame, x, y, width, height, theme, default_color=None):
+    story = []
+    for paragraph in text_frame.paragraphs:
+        markup = _paragraph_markup(paragraph, theme, default_color)
+        sizes = [run.font.size.pt for run in paragraph.runs if run.font.size]
+        size = max(sizes) if sizes else DEFAULT_FONT_SIZE
+        style = ParagraphStyle(
+            'slide',
+            fontSize=size,
+            leading=size * 1.2,
+            alignment=ALIGNMENTS.get(paragraph.alignment, TA_LEFT),
+            leftIndent=paragraph.level * size,
+        )
+        story.append(Paragraph(markup or '&nbsp;', style))
+    frame = Frame(x, y, width, height, leftPadding=7.2, rightPadding=7.2, topPadding=3.6, bottomPadding=3.6, showBoundary=0)
+    # Shrink-on-overflow boxes scale their text down; all others are clipped to the box
+    mode = 'shrink' if text_frame.auto_size == MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE else 'truncate'
+    frame.addFromList([KeepInFrame(frame._aW, frame._aH, story, mode=mode)], pdf)
+
+
+def _draw_table(pdf, table, x, y, width, height):
+    data = [[cell.text for cell in row.cells] for row in table.rows]
+    if not data:
+        return
+    col_widths = [_pt(column.width) for column in table.columns]
+    row_heights = [_pt(row.height) for row in table.rows]
+    rendered = Table(data, colWidths=col_widths, rowHeights=row_heights)
+    rendered.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ]))
+    rendered.wrapOn(pdf, width, height)
+    rendered.drawOn(pdf, x, y + height - sum(row_heights))
+
+
+def _draw_shapes(pdf, shapes, page_height, theme, images):
+    for shape in shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            _draw_shapes(pdf, shape.shapes, page_height, theme, images)
+            continue
+        if shape.width is None or shape.height is None:
+            continue
+        x, y, width, height = _box(shape, page_height)
+        if shape.shape_type == MSO_SHAPE_TYPE.LINE:
+            stroke = _rgb(shape.line.color, theme) or _style_color(shape, 'lnRef', theme) or colors.black
+            pdf.saveState()
+            pdf.setStrokeColor(stroke)
+            pdf.line(_pt(shape.begin_x), page_height - _pt(shape.begin_y), _pt(shape.end_x), page_height - _pt(shape.end_y))
+            pdf.restoreState()
+            continue
+        # Covers pictures and picture placeholders (empty placeholders have no image part)
+        if isinstance(shape, Picture):
+            if shape._pic.blip_rId is not None:
+                pdf.drawImage(_image_reader(shape.image, images), x, y, width, height, mask='auto')
+            continue
+        if shape.shape_type == MSO_SHAPE_TYPE.AUTO_SHAPE:
+            _draw_autoshape(pdf, shape, x, y, width, height, theme)
+        if getattr(shape, 'has_table', False):
+            _draw_table(pdf, shape.table, x, y, width, height)
+        elif shape.has_text_frame and shape.text_frame.text.strip():
+            font_color = _style_color(shape, 'fontRef', theme)
+            _draw_text_frame(pdf, shape.text_frame, x, y, width, height, theme, font_color.hexval().replace('0x', '#') if font_color else None)
+
+
+def _render_slides(args):
+    """Render a range of slides to PDF bytes."""
+    pptx_path, start, stop = args
+    prs = Presentation(pptx_path)
+    page_width, page_height = _pt(prs.slide_width), _pt(prs.slide_height)
+    output = io.BytesIO()
+    pdf = canvas.Canvas(output, pagesize=(page_width, page_height))
+    # Caches live for one call; rendering can run inside the long-lived server process
+    themes, images = {}, {}
+    for slide in list(prs.slides)[start:stop]:
+        _draw_shapes(pdf, slide.shapes, page_height, _theme_colors(slide, themes), images)
+        pdf.showPage()
+    pdf.save()
+    return output.getvalue()
+
+
+# Render slides across a process pool and assemble them in order
+def render_pptx_to_pdf(pptx_path, output_path='presentation.pdf', workers=None):
+    """Render text frames, images, tables and basic shapes of a PPTX into a PDF."""
+    slide_count = len(Presentation(pptx_path).slides)
+    workers = workers or os.cpu_count() or 1
+    if slide_count < PARALLEL_THRESHOLD or workers == 1:
+        parts = [_render_slides((pptx_path, 0, slide_count))]
+    else:
+        chunk_size = -(-slide_count // workers)
+        ranges = [(pptx_path, start, min(start + chunk_size, slide_count)) for start in range(0, slide_count, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map keeps results in submission (slide) order
+            parts = list(pool.map(_render_slides, ranges))
+
+    with fitz.open() as merged:
+        for part in parts:
+            with fitz.open(stream=part, filetype='pdf') as part_doc:
+                merged.insert_pdf(part_doc)
+        merged.save(output_path, garbage=3, deflate=True)
+    return output_path
@@ -2,25 +2,16 @@ from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.pdfgen import canvas
 from PyPDF2 import PdfFileReader, PdfFileWriter
 from PIL import Image
+import os
 
-def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True):
+from functions.image_pyramid import fit_image
+
+def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True, save=True):
     """Resize and position an image within the target dimensions."""
-    img = Image.open(image_path)
-    original_width, original_height = img.size
-
-    if keep_aspect_ratio:
-        ratio = min(target_width / original_width, target_height / original_height)
-        new_width = int(original_width * ratio)
-        new_height = int(original_height * ratio)
-        img = img.resize((new_width, new_height), Image.ANTIALIAS)
-    else:
-        img = img.resize((target_width, target_height), Image.ANTIALIAS)
-
-    # Create a new image with white background and paste the resized image
-    new_img = Image.new('RGB', (target_width, target_height), (255, 255, 255))
-    paste_x = (target_width - new_width) // 2
-    paste_y = (target_height - new_height) // 2
-    new_img.paste(img, (paste_x, paste_y))
+    # Decodes at reduced JPEG scale and resamples from a cached pyramid
+    new_img = fit_image(image_path, target_width, target_height, keep_aspect_ratio)
+    if not save:
+        return new_img
 
     output_path = 'resized_' + os.path.basename(image_path)
     new_img.save(output_path)
@@ -135,5 +126,6 @@ def create_print_ready_book(pdf_path, cover_image_path, back_cover_image_path, t
     
     return print_ready_pdf
 
-# Example usage
-print_ready_pdf = create_print_ready_book('../test_data/RR.pdf', '../test_data/front.jpg', '../test_data/back.jpg')
+# Example usage (python -m functions.print from backend/)
+if __name__ == '__main__':
+    print_ready_pdf = create_print_ready_book('../test_data/RR.pdf', '../test_data/front.jpg', '../test_data/back.jpg')
@@ -4,7 +4,9 @@ from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
 import os
 
-def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True):
+from functions.image_pyramid import fit_image
+
+def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True, save=True):
     """
     Resize and position an image within the target dimensions.
 
@@ -13,27 +15,16 @@ def resize_and_position_image(image_path, target_width, target_height, keep_aspe
     - target_width (int): The target width of the resized image.
     - target_height (int): The target height of the resized image.
     - keep_aspect_ratio (bool): Whether to maintain the aspect ratio of the image.
+    - save (bool): Whether to save the result or return the in-memory image.
 
     Returns:
-    - output_path (str): Path to the resized image.
+    - output_path (str): Path to the resized image, or the PIL image when save is False.
     """
     try:
-        img = Image.open(image_path)
-        original_width, original_height = img.size
-
-        if keep_aspect_ratio:
-            ratio = min(target_width / original_width, target_height / original_height)
-            new_width = int(original_width * ratio)
-            new_height = int(original_height * ratio)
-            img = img.resize((new_width, new_height), Image.ANTIALIAS)
-        else:
-            img = img.resize((target_width, target_height), Image.ANTIALIAS)
-
-        # Create a new image with a white background and paste the resized image
-        new_img = Image.new('RGB', (target_width, target_height), (255, 255, 255))
-        paste_x = (target_width - new_width) // 2
-        paste_y = (target_height - new_height) // 2
-        new_img.paste(img, (paste_x, paste_y))
+        # Decodes at reduced JPEG scale and resamples from a cached pyramid
+        new_img = fit_image(image_path, target_width, target_height, keep_aspect_ratio)
+        if not save:
+            return new_img
 
         output_path = 'resized_' + os.path.basename(image_path)
         new_img.save(output_path)
@@ -254,5 +245,6 @@ def create_print_ready_book(pdf_path, cover_image_path, back_cover_image_path, t
         print(f"Error creating print-ready book: {e}")
         return None
 
-# Example usage
-print_ready_pdf = create_print_ready_book('../test_data/RR.pdf', '../test_data/front.jpg', '../test_data/back.jpg')
\ No newline at end of file
+# Example usage (python -m functions.print1 from backend/)
+if __name__ == '__main__':
+    print_ready_pdf = create_print_ready_book('../test_data/RR.pdf', '../test_data/front.jpg', '../test_data/back.jpg')
@@ -2,9 +2,13 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from PyPDF2 import PdfFileReader, PdfFileWriter
 from PIL import Image
+import io
 import os
 import zipfile
 
+from functions import metrics
+from functions.image_pyramid import fit_image
+
 # Define the trim sizes
 TRIM_SIZES = {
     '5 x 8 in': (5 * 72, 8 * 72),
@@ -25,23 +29,20 @@ TRIM_SIZES = {
     '8.5 x 8.5 in': (8.5 * 72, 8.5 * 72)
 }
 
-def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True):
+class BuildStageError(RuntimeError):
+    """Raised when one stage of a print-ready build produces no output."""
+
+    def __init__(self, stage, size_name):
+        super().__init__(f"Stage '{stage}' failed for trim size {size_name}")
+        self.stage = stage
+        self.size_name = size_name
+
+def resize_and_position_image(image_path, target_width, target_height, keep_aspect_ratio=True, save=True):
     try:
-        img = Image.open(image_path)
-        original_width, original_height = img.size
-
-        if keep_aspect_ratio:
-            ratio = min(target_width / original_width, target_height / original_height)
-            new_width = int(original_width * ratio)
-            new_height = int(original_height * ratio)
-            img = img.resize((new_width, new_height), Image.ANTIALIAS)
-        else:
-            img = img.resize((target_width, target_height), Image.ANTIALIAS)
-
-        new_img = Image.new('RGB', (target_width, target_height), (255, 255, 255))
-        paste_x = (target_width - new_width) // 2
-        paste_y = (target_height - new_height) // 2
-        new_img.paste(img, (paste_x, paste_y))
+        # Decodes at reduced JPEG scale and resamples from a cached pyramid
+        new_img = fit_image(image_path, target_width, target_height, keep_aspect_ratio)
+        if not save:
+            return new_img
 
         output_path = 'resized_' + os.path.basename(image_path)
         new_img.save(output_path)
@@ -67,8 +68,6 @@ def set_page_size(pdf_path, page_size, margins=(0.5*72, 0.5*72, 0.5*72, 0.5*72))
             new_page.trimBox.lowerLeft = (margins[3], margins[2])
             new_page.trimBox.upperRight = (width - margins[1], height - margins[0])
 
-            writer.addPage(new_page)
-
         output_path = f'print_ready_{os.path.basename(pdf_path).replace(".pdf", "")}_{width}x{height}.pdf'
         with open(output_path, 'wb') as output_file:
             writer.write(output_file)
@@ -77,6 +76,24 @@ def set_page_size(pdf_path, page_size, margins=(0.5*72, 0.5*72, 0.5*72, 0.5*72))
         print(f"Error setting page size: {e}")
         return None
 
+def crop_marks_page(width, height, bleed_size):
+    # PyPDF2 pages cannot draw, so the marks are drawn with reportlab and merged on top
+    buffer = io.BytesIO()
+    marks = canvas.Canvas(buffer, pagesize=(width + 2*bleed_size, height + 2*bleed_size))
+    marks.setLineWidth(0.25)
+    marks.line(bleed_size, 0, bleed_size, bleed_size)
+    marks.line(0, bleed_size, bleed_size, bleed_size)
+    marks.line(width + bleed_size, 0, width + bleed_size, bleed_size)
+    marks.line(width + 2*bleed_size, bleed_size, width + bleed_size, bleed_size)
+    marks.line(bleed_size, height + bleed_size, bleed_size, height + 2*bleed_size)
+    marks.line(0, height + bleed_size, bleed_size, height + bleed_size)
+    marks.line(width + bleed_size, height + bleed_size, width + bleed_size, height + 2*bleed_size)
+    marks.line(width + 2*bleed_size, height + bleed_size, width + bleed_size, height + bleed_size)
+    marks.showPage()
+    marks.save()
+    buffer.seek(0)
+    return PdfFileReader(buffer).getPage(0)
+
 def add_bleeds_and_crop_marks(pdf_path, bleed_size=0.125*72):
     try:
         reader = PdfFileReader(pdf_path)
@@ -84,22 +101,12 @@ def add_bleeds_and_crop_marks(pdf_path, bleed_size=0.125*72):
 
         for page_num in range(reader.getNumPages()):
             page = reader.getPage(page_num)
-            width = page.mediaBox.getWidth()
-            height = page.mediaBox.getHeight()
+            width = float(page.mediaBox.getWidth())
+            height = float(page.mediaBox.getHeight())
 
             new_page = writer.addBlankPage(width + 2*bleed_size, height + 2*bleed_size)
             new_page.mergeTranslatedPage(page, bleed_size, bleed_size)
-
-            new_page.drawLine((bleed_size, 0), (bleed_size, bleed_size))
-            new_page.drawLine((0, bleed_size), (bleed_size, bleed_size))
-            new_page.drawLine((width + bleed_size, 0), (width + bleed_size, bleed_size))
-            new_page.drawLine((width + 2*bleed_size, bleed_size), (width + bleed_size, bleed_size))
-            new_page.drawLine((bleed_size, height + bleed_size), (bleed_size, height + 2*bleed_size))
-            new_page.drawLine((0, height + bleed_size), (bleed_size, height + bleed_size))
-            new_page.drawLine((width + bleed_size, height + bleed_size), (width + bleed_size, height + 2*bleed_size))
-            new_page.drawLine((width + 2*bleed_size, height + bleed_size), (width + bleed_size, height + bleed_size))
-
-            writer.addPage(new_page)
+            new_page.mergePage(crop_marks_page(width, height, bleed_size))
 
         output_path = 'bleeds_' + os.path.basename(pdf_path)
         with open(output_path, 'wb') as output_file:
@@ -115,6 +122,8 @@ def generate_cover_pages(cover_image_path, back_cover_image_path, spine_width, o
         back_cover_img = Image.open(back_cover_image_path)
 
         width, height = cover_img.size
+        # Pixel sizes must be whole numbers
+        spine_width = int(round(spine_width))
         total_width = 2*width + spine_width
 
         cover = Image.new('RGB', (total_width, height), (255, 255, 255))
@@ -159,33 +168,53 @@ def merge_pdfs(pdf_paths, output_path='merged.pdf'):
         print(f"Error merging PDFs: {e}")
         return None
 
-def create_print_ready_book(pdf_path, cover_image_path, back_cover_image_path, trim_sizes, spine_width=36, output_zip='print_ready_books.zip'):
+def create_print_ready_book(pdf_path, cover_image_path, back_cover_image_path, trim_sizes, spine_width=36, output_zip='print_ready_books.zip', raise_errors=False):
     try:
         with zipfile.ZipFile(output_zip, 'w') as zipf:
             for size_name, size in trim_sizes.items():
                 # Step 1: Set up page size and margins
-                formatted_pdf = set_page_size(pdf_path, page_size=size)
+                with metrics.stage('set_page_size'):
+                    formatted_pdf = set_page_size(pdf_path, page_size=size)
+                if formatted_pdf is None:
+                    raise BuildStageError('set_page_size', size_name)
 
                 # Step 2: Add bleeds and crop marks
-                pdf_with_bleeds = add_bleeds_and_crop_marks(formatted_pdf)
+                with metrics.stage('bleeds'):
+                    pdf_with_bleeds = add_bleeds_and_crop_marks(formatted_pdf)
+                if pdf_with_bleeds is None:
+                    raise BuildStageError('bleeds', size_name)
 
                 # Step 3: Generate cover pages
-                cover_pdf = generate_cover_pages(cover_image_path, back_cover_image_path, spine_width)
+                with metrics.stage('cover'):
+                    cover_pdf = generate_cover_pages(cover_image_path, back_cover_image_path, spine_width)
+                if cover_pdf is None:
+                    raise BuildStageError('cover', size_name)
 
                 # Step 4: Combine cover and content
-                combined_pdf = merge_pdfs([cover_pdf, pdf_with_bleeds])
+                with metrics.stage('merge'):
+                    combined_pdf = merge_pdfs([cover_pdf, pdf_with_bleeds])
+                if combined_pdf is None:
+                    raise BuildStageError('merge', size_name)
 
                 # Step 5: Embed fonts
-                print_ready_pdf = embed_fonts(combined_pdf)
+                with metrics.stage('embed_fonts'):
+                    print_ready_pdf = embed_fonts(combined_pdf)
+                if print_ready_pdf is None:
+                    raise BuildStageError('embed_fonts', size_name)
 
-                # Save the final print-ready PDF in the zip file
-                zipf.write(print_ready_pdf, os.path.basename(print_ready_pdf))
+                # Save the final print-ready PDF in the zip file, one entry per trim size
+                with metrics.stage('zip'):
+                    zipf.write(print_ready_pdf, f"{size_name.replace(' ', '')}.pdf")
 
         return output_zip
     except Exception as e:
         print(f"Error creating print-ready book: {e}")
+        # Batch builds need to know which stage failed
+        if raise_errors:
+            raise
         return None
 
-# Example usage
-output_zip = create_print_ready_book('example.pdf', 'cover.jpg', 'back_cover.jpg', TRIM_SIZES)
-print(f"Print-ready books saved in: {output_zip}")
+# Example usage (python -m functions.print2 from backend/)
+if __name__ == '__main__':
+    output_zip = create_print_ready_book('example.pdf', 'cover.jpg', 'back_cover.jpg', TRIM_SIZES)
+    print(f"Print-ready books saved in: {output_zip}")
@@ -0,0 +1,123 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from functions.doc_index import file_sha256
+
+# Detected headings are cached per document hash so other stages can reuse them
+TOC_CACHE_DIR = os.environ.get('EBC_TOC_CACHE_DIR', '.toc_cache')
+
+# A line counts as a heading candidate when its font is this much larger than body text
+HEADING_SIZE_RATIO = 1.15
+
+# Longer lines are treated as body text whatever their size
+MAX_HEADING_CHARS = 120
+
+# Fewer pages than this are scanned in-process
+PARALLEL_THRESHOLD = 32
+
+_memory_cache = {}
+
+
+def _scan_pages(args):
+    """Return the font-size histogram and text lines for a range of pages."""
+    pdf_path, start, stop = args
+    sizes = Counter()
+    lines = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, stop):
+            text_page = doc.load_page(page_num).get_text('dict', flags=fitz.TEXTFLAGS_TEXT)
+            for block in text_page['blocks']:
+                for line in block.get('lines', []):
+                    spans = [span for span in line['spans'] if span['text'].strip()]
+                    if not spans:
+                        continue
+                    text = ''.join(span['text'] for span in spans).strip()
+                    size = round(max(span['size'] for span in spans), 1)
+                    sizes[size] += len(text)
+                    # Long lines are kept (without text) so they still break up headings
+                    lines.append((page_num, size, text if len(text) <= MAX_HEADING_CHARS else None))
+    return sizes, lines
+
+
+def _infer_headings(sizes, lines, max_levels):
+    if not sizes:
+        return []
+    body_size = sizes.most_common(1)[0][0]
+    heading_sizes = sorted((size for size in sizes if size >= body_size * HEADING_SIZE_RATIO), reverse=True)
+    levels = {size: level for level, size in enumerate(heading_sizes[:max_levels], start=1)}
+
+    headings = []
+    for page_num, size, text in lines:
+        level = levels.get(size) if text is not None else None
+        previous = headings[-1] if headings else None
+        if level is None:
+            if previous:
+                previous['adjacent'] = False
+            continue
+        # Consecutive lines of the same heading style on one page are one wrapped heading
+        if previous and previous['adjacent'] and previous['page'] == page_num and previous['size'] == size:
+            previous['title'] += ' ' + text
+            continue
+        headings.append({'level': level, 'title': text, 'page': page_num, 'size': size, 'adjacent': True})
+    for heading in headings:
+        del heading['adjacent']
+    return headings
+
+
+# Scan text spans in parallel and infer heading levels from font sizes
+def detect_headings(pdf_path, workers=None, max_levels=3):
+    """Detect headings in a PDF; pages in the result are 0-based."""
+    sha256 = file_sha256(pdf_path)
+    cache_key = (sha256, max_levels)
+    if cache_key in _memory_cache:
+        return _memory_cache[cache_key]
+    cache_path = os.path.join(TOC_CACHE_DIR, f'{sha256}_{max_levels}.json')
+    if os.path.exists(cache_path):
+        with open(cache_path) as cache_file:
+            headings = json.load(cache_file)
+        _memory_cache[cache_key] = headings
+        return headings
+
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    workers = workers or os.cpu_count() or 1
+    if page_count < PARALLEL_THRESHOLD or workers == 1:
+        results = [_scan_pages((pdf_path, 0, page_count))]
+    else:
+        chunk_size = -(-page_count // workers)
+        ranges = [(pdf_path, start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_scan_pages, ranges))
+
+    sizes = Counter()
+    lines = []
+    for chunk_sizes, chunk_lines in results:
+        sizes.update(chunk_sizes)
+        lines.extend(chunk_lines)
+    headings = _infer_headings(sizes, lines, max_levels)
+
+    os.makedirs(TOC_CACHE_DIR, exist_ok=True)
+    with open(cache_path, 'w') as cache_file:
+        json.dump(headings, cache_file)
+    _memory_cache[cache_key] = headings
+    return headings
+
+
+# Write an outline onto a PDF without copying its pages
+def write_outline(pdf_path, toc, output_path):
+    """Set the outline of a PDF from entries with 'title', 0-based 'page' and optional 'level'."""
+    outline = []
+    previous_level = 0
+    for entry in toc:
+        # PyMuPDF requires each level to be at most one deeper than the previous one
+        level = min(entry.get('level', 1), previous_level + 1)
+        outline.append([level, entry['title'], entry['page'] + 1])
+        previous_level = level
+    with fitz.open(pdf_path) as doc:
+        doc.set_toc(outline)
+        doc.save(output_path, garbage=0)
+    return output_path
@@ -0,0 +1,148 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+# Largest accepted upload, configurable with EBC_MAX_UPLOAD_MB
+MAX_UPLOAD_BYTES = int(os.environ.get('EBC_MAX_UPLOAD_MB', '1024')) * 1024 * 1024
+
+# Directory uploads are spooled into (defaults to the system temp dir)
+SPOOL_DIR = os.environ.get('EBC_SPOOL_DIR')
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+class MappedReader(io.RawIOBase):
+    """Independent read-only file object over a shared memory map."""
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Seeking past EOF is allowed; reads from there return nothing
+        start = min(self._position, len(self._view))
+        end = min(start + len(buffer), len(self._view))
+        count = end - start
+        buffer[:count] = self._view[start:end]
+        self._position = max(self._position, end)
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def tell(self):
+        return self._position
+
+
+class SpooledUpload:
+    """An upload written to disk once and shared through a read-only memory map."""
+
+    def __init__(self, path, filename, remove=True):
+        self.path = path
+        self.filename = filename
+        # Spooled uploads own their temp dir; job workspaces outlive the upload
+        self.remove = remove
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        # mmap cannot map empty files
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._view = memoryview(self._mmap) if self._mmap is not None else memoryview(b'')
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.filename)[1].lstrip('.').lower()
+
+    def open(self):
+        """Return a new seekable reader; every stage can hold its own."""
+        return MappedReader(self._view)
+
+    def view(self):
+        """Return the zero-copy memoryview over the upload contents."""
+        return self._view
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+        if self.remove:
+            shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SpoolFile(io.FileIO):
+    """A multipart file part written by Werkzeug directly into its own spool dir."""
+
+
+class SpoolingRequest(Request):
+    """Request that parses multipart file parts straight into spool dirs instead of Werkzeug temp files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool_dir = tempfile.mkdtemp(prefix='ebc_upload_', dir=SPOOL_DIR)
+        self.__dict__.setdefault('_spool_dirs', []).append(spool_dir)
+        return SpoolFile(os.path.join(spool_dir, 'upload.part'), 'w+b')
+
+    def close(self):
+        super().close()
+        # Parts no view spooled (or that outlived their SpooledUpload) go with the request
+        for spool_dir in self.__dict__.pop('_spool_dirs', ()):
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+# Spool a Werkzeug FileStorage (or any binary stream) to disk exactly once
+def spool_upload(file, filename=None, max_bytes=MAX_UPLOAD_BYTES):
+    """Spool an uploaded file to a private temp dir and memory-map it."""
+    filename = filename or getattr(file, 'filename', None) or 'upload'
+    stream = getattr(file, 'stream', file)
+    if isinstance(stream, SpoolFile) and os.path.exists(stream.name):
+        # Already on disk from request parsing: just give it its name and map it
+        stream.flush()
+        if os.path.getsize(stream.name) > max_bytes:
+            raise RequestEntityTooLarge()
+        path = os.path.join(os.path.dirname(stream.name), secure_filename(filename) or 'upload')
+        os.replace(stream.name, path)
+        return SpooledUpload(path, filename)
+
+    spool_dir = tempfile.mkdtemp(prefix='ebc_upload_', dir=SPOOL_DIR)
+    # Keep the original basename so derived outputs (resized_<name>, ...) stay recognisable
+    path = os.path.join(spool_dir, secure_filename(filename) or 'upload')
+    written = 0
+    try:
+        with open(path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b''):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise RequestEntityTooLarge()
+                out.write(chunk)
+    except Exception:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        raise
+    return SpooledUpload(path, filename)
@@ -1,5 +1,10 @@
 import { useState } from 'react';
 
+const API_URL = 'http://localhost:5000';
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const PARALLEL_CHUNKS = 3;
+const MAX_RETRIES = 5;
+
 export default function FileUpload() {
     const [file, setFile] = useState(null);
     const [width, setWidth] = useState(800);
@@ -20,20 +25,86 @@ export default function FileUpload() {
         setHeight(e.target.value);
     };
 
+    // Hash a chunk so the backend can verify it arrived intact
+    const sha256 = async (blob) => {
+        const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+    };
+
+    // Send one chunk, retrying with backoff on network errors and 5xx responses
+    const sendChunk = async (uploadId, index, chunk) => {
+        const checksum = await sha256(chunk);
+        for (let attempt = 0; attempt < MAX_RETRIES; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(`${API_URL}/upload/${uploadId}/chunk/${index}`, {
+                    method: 'PUT',
+                    headers: { 'X-Chunk-SHA256': checksum },
+                    body: chunk,
+                });
+            } catch (err) {
+                // Dropped connection; fall through to retry
+            }
+            if (response && response.ok) return;
+            // A 4xx (bad checksum, bad index, unknown upload) will fail the same way again
+            if (response && response.status < 500) {
+                const { message } = await response.json().catch(() => ({}));
+                throw new Error(`Chunk ${index} rejected: ${message || response.status}`);
+            }
+            await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+        }
+        throw new Error(`Chunk ${index} failed after ${MAX_RETRIES} attempts`);
+    };
+
+    // Reuse an unfinished upload of the same file, or start a new one
+    const startUpload = async () => {
+        const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+        const savedId = localStorage.getItem(resumeKey);
+        if (savedId) {
+            const response = await fetch(`${API_URL}/upload/${savedId}`);
+            if (response.ok) return { resumeKey, status: await response.json() };
+            // The backend no longer knows this upload (e.g. it expired)
+            localStorage.removeItem(resumeKey);
+        }
+        const formData = new FormData();
+        formData.append('filename', file.name);
+        formData.append('size', file.size);
+        formData.append('chunk_size', CHUNK_SIZE);
+        const response = await fetch(`${API_URL}/upload/init`, { method: 'POST', body: formData });
+        const meta = await response.json();
+        if (!response.ok) throw new Error(meta.message || `Upload init failed: ${response.status}`);
+        localStorage.setItem(resumeKey, meta.upload_id);
+        return { resumeKey, status: { ...meta, missing: [...Array(meta.chunk_count).keys()] } };
+    };
+
     // Handle form submission for file upload
     const handleSubmit = async (e) => {
         e.preventDefault();
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('width', width);
-        formData.append('height', height);
-        
-        const response = await fetch('http://localhost:5000/upload', {
-            method: 'POST',
-            body: formData,
-        });
+        try {
+            await uploadFile();
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
+    // Upload the missing chunks, then ask the backend to assemble and process the file
+    const uploadFile = async () => {
+        const { resumeKey, status } = await startUpload();
+        const { upload_id: uploadId, chunk_size: chunkSize, missing } = status;
+
+        // Only chunks the backend has not stored yet are sent, a few at a time
+        const queue = [...missing];
+        const worker = async () => {
+            while (queue.length) {
+                const index = queue.shift();
+                await sendChunk(uploadId, index, file.slice(index * chunkSize, (index + 1) * chunkSize));
+            }
+        };
+        await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
 
+        const response = await fetch(`${API_URL}/upload/${uploadId}/complete`, { method: 'POST' });
         const result = await response.json();
+        if (response.ok) localStorage.removeItem(resumeKey);
         console.log(result);
     };
 